@@ -1,20 +1,136 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, g, has_request_context, abort, Response, stream_with_context, before_render_template, template_rendered
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from datetime import datetime
-from sqlalchemy import or_, and_
+from datetime import datetime, date, time as dt_time, timedelta
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import or_, and_, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import sqlite, postgresql, mysql
+from sqlalchemy.orm import joinedload, selectinload, contains_eager
 import os
+import queue
+import sqlite3
+import base64
+import binascii
+import bisect
+import heapq
+import csv
+import io
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from collections import OrderedDict
+import threading
+import time
+import unicodedata
+import functools
+import click
+import hmac
+import smtplib
+from email.message import EmailMessage
+from email.utils import formataddr
 from werkzeug.security import generate_password_hash, check_password_hash
+from markupsafe import Markup, escape
 
 app = Flask(__name__)
 CORS(app)
 
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'condominio.db')
+
+def uri_banco_dados():
+    uri = os.environ.get('DATABASE_URL')
+    if not uri:
+        return 'sqlite:///' + os.path.join(basedir, 'condominio.db')
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+def sqlite_em_memoria(uri):
+    url = make_url(uri)
+    return url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+
+def opcoes_engine(uri):
+    if uri.startswith('sqlite'):
+        conexao = {
+            'connect_args': {
+                'timeout': app.config['SQLITE_BUSY_TIMEOUT'] / 1000,
+                'check_same_thread': False
+            }
+        }
+        if sqlite_em_memoria(uri):
+            return conexao
+        return {
+            **conexao,
+            'pool_size': app.config['DB_POOL_SIZE'],
+            'max_overflow': app.config['DB_MAX_OVERFLOW'],
+            'pool_timeout': app.config['DB_POOL_TIMEOUT']
+        }
+    return {
+        'pool_size': app.config['DB_POOL_SIZE'],
+        'max_overflow': app.config['DB_MAX_OVERFLOW'],
+        'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+        'pool_recycle': app.config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True
+    }
+
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+app.config['SQLALCHEMY_DATABASE_URI'] = uri_banco_dados()
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'sua_chave_secreta_aqui'
+app.config['BADGES_CACHE_TTL'] = 30
+app.config['USUARIO_CACHE_TTL'] = 30
+app.config['PAGE_SIZE'] = 50
+app.config['PAGE_SIZE_MAX'] = 200
+app.config['RESERVA_ABERTURA'] = dt_time(8, 0)
+app.config['RESERVA_FECHAMENTO'] = dt_time(22, 0)
+app.config['DISPONIBILIDADE_DIAS_MAX'] = 60
+app.config['IMPORTACAO_TAMANHO_LOTE'] = 500
+app.config['EXPORTACAO_TAMANHO_LOTE'] = 1000
+app.config['CHAT_SSE_KEEPALIVE'] = 15
+app.config['CHAT_SSE_DURACAO_MAXIMA'] = int(os.environ.get('CHAT_SSE_DURACAO_MAXIMA', 300))
+app.config['CHAT_SSE_TAMANHO_FILA'] = 100
+app.config['CHECKIN_SUGESTOES_MAX'] = 10
+app.config['CHECKIN_ALTERACOES_MAX'] = 1000
+app.config['QUERY_BUDGET_ENFORCE'] = os.environ.get('QUERY_BUDGET_ENFORCE') == '1'
+app.config['METRICAS_TOKEN'] = os.environ.get('METRICAS_TOKEN')
+app.config['CONSULTA_LENTA_MS'] = int(os.environ.get('CONSULTA_LENTA_MS', 200))
+app.config['CONSULTA_LENTA_LOG_CAPACIDADE'] = 5
+app.config['CONSULTA_LENTA_LOG_JANELA'] = 60
+app.config['SENHA_HASH_METODO'] = os.environ.get('SENHA_HASH_METODO', 'pbkdf2:sha256:600000')
+app.config['SENHA_SALT_TAMANHO'] = 16
+app.config['LOGIN_LIMITE_IP_CAPACIDADE'] = 20
+app.config['LOGIN_LIMITE_IP_JANELA'] = 60
+app.config['LOGIN_LIMITE_USUARIO_CAPACIDADE'] = 5
+app.config['LOGIN_LIMITE_USUARIO_JANELA'] = 300
+app.config['AGENDADOR_EMBUTIDO'] = os.environ.get('AGENDADOR_EMBUTIDO') == '1'
+app.config['AGENDADOR_ESPERA_MAXIMA'] = 30
+app.config['AGENDADOR_TEMPO_LIMITE'] = 600
+app.config['TAREFAS_TAMANHO_LOTE'] = 500
+app.config['VISITA_DURACAO_MAXIMA_HORAS'] = 12
+app.config['EMAIL_SMTP_HOST'] = os.environ.get('EMAIL_SMTP_HOST', 'localhost')
+app.config['EMAIL_SMTP_PORTA'] = int(os.environ.get('EMAIL_SMTP_PORTA', '1025'))
+app.config['EMAIL_REMETENTE'] = os.environ.get('EMAIL_REMETENTE', 'condominio@localhost')
+app.config['EMAIL_TAMANHO_LOTE'] = 100
+app.config['EMAIL_MAX_TENTATIVAS'] = 5
 
-db = SQLAlchemy(app)
+db = SQLAlchemy()
+
+@event.listens_for(Engine, 'connect')
+def configurar_conexao_sqlite(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={app.config['SQLITE_JOURNAL_MODE']}")
+    cursor.execute(f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}")
+    cursor.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT']}")
+    cursor.close()
 
 class Unidade(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -33,7 +149,7 @@ class Morador(db.Model):
     telefone = db.Column(db.String(15), nullable=False)
     email = db.Column(db.String(100), nullable=False)
     tipo = db.Column(db.String(20), nullable=False)
-    unidade_id = db.Column(db.Integer, db.ForeignKey('unidade.id'), nullable=False)
+    unidade_id = db.Column(db.Integer, db.ForeignKey('unidade.id'), nullable=False, index=True)
     data_cadastro = db.Column(db.DateTime, default=datetime.utcnow)
     
     reservas = db.relationship('Reserva', backref='morador', lazy=True)
@@ -52,32 +168,79 @@ class Usuario(db.Model):
     morador = db.relationship('Morador', backref='usuario', uselist=False)
     notificacoes_enviadas = db.relationship('Notificacao', backref='autor', lazy=True)
     notificacoes_lidas = db.relationship('NotificacaoLeitura', backref='usuario', lazy=True, cascade='all, delete-orphan')
+    marcador_notificacoes = db.relationship('NotificacaoMarcador', uselist=False, lazy=True, cascade='all, delete-orphan')
     mensagens_enviadas = db.relationship('ChatMensagem', foreign_keys='ChatMensagem.remetente_id', backref='remetente', lazy=True, cascade='all, delete-orphan')
     mensagens_recebidas = db.relationship('ChatMensagem', foreign_keys='ChatMensagem.destinatario_id', backref='destinatario', lazy=True, cascade='all, delete-orphan')
+    conversas = db.relationship('ConversaResumo', foreign_keys='ConversaResumo.usuario_id', lazy=True, cascade='all, delete-orphan')
 
 class Visitante(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
-    cpf = db.Column(db.String(14), nullable=False)
+    cpf = db.Column(db.String(14), nullable=False, index=True)
     telefone = db.Column(db.String(15), nullable=False)
     unidade_id = db.Column(db.Integer, db.ForeignKey('unidade.id'), nullable=False)
-    data_entrada = db.Column(db.DateTime, default=datetime.utcnow)
-    data_saida = db.Column(db.DateTime, nullable=True)
+    data_entrada = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    data_saida = db.Column(db.DateTime, nullable=True, index=True)
     observacoes = db.Column(db.Text, nullable=True)
     
     unidade = db.relationship('Unidade', backref='visitantes')
+    
+    __table_args__ = (
+        db.Index('ix_visitante_unidade_saida', 'unidade_id', 'data_saida'),
+        db.Index('ix_visitante_unidade_entrada', 'unidade_id', 'data_entrada'),
+    )
+
+class ContagemVisitantes(db.Model):
+    unidade_id = db.Column(db.Integer, primary_key=True)
+    total = db.Column(db.BigInteger, nullable=False, default=0)
+
+class Centavos(db.TypeDecorator):
+    impl = db.Integer
+    cache_ok = True
+    
+    def process_result_value(self, valor, dialect):
+        return None if valor is None else Decimal(valor).scaleb(-2)
 
 class Multa(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     morador_id = db.Column(db.Integer, db.ForeignKey('morador.id'), nullable=False)
-    valor = db.Column(db.Float, nullable=False)
+    valor_centavos = db.Column(db.Integer, nullable=False)
     descricao = db.Column(db.Text, nullable=False)
-    data_vencimento = db.Column(db.Date, nullable=False)
+    data_vencimento = db.Column(db.Date, nullable=False, index=True)
     data_pagamento = db.Column(db.Date, nullable=True)
-    status = db.Column(db.String(20), default='Pendente')
+    status = db.Column(db.String(20), default='Pendente', index=True)
     data_cadastro = db.Column(db.DateTime, default=datetime.utcnow)
     
     morador = db.relationship('Morador', backref='multas')
+    
+    __table_args__ = (
+        db.Index('ix_multa_morador_status', 'morador_id', 'status'),
+    )
+    
+    @property
+    def valor(self):
+        return Decimal(self.valor_centavos).scaleb(-2)
+
+class SaldoMultas(db.Model):
+    escopo = db.Column(db.String(10), primary_key=True)
+    referencia_id = db.Column(db.Integer, primary_key=True)
+    multas_abertas = db.Column(db.Integer, nullable=False, default=0)
+    aberto_centavos = db.Column(db.BigInteger, nullable=False, default=0)
+    multas_vencidas = db.Column(db.Integer, nullable=False, default=0)
+    vencido_centavos = db.Column(db.BigInteger, nullable=False, default=0)
+    multas_pagas = db.Column(db.Integer, nullable=False, default=0)
+    pago_centavos = db.Column(db.BigInteger, nullable=False, default=0)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    unidade = db.relationship(
+        'Unidade',
+        primaryjoin="and_(SaldoMultas.escopo == 'unidade', foreign(SaldoMultas.referencia_id) == Unidade.id)",
+        viewonly=True
+    )
+    
+    __table_args__ = (
+        db.Index('ix_saldo_multas_inadimplencia', 'escopo', 'vencido_centavos', 'referencia_id'),
+    )
 
 class Reserva(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -89,6 +252,23 @@ class Reserva(db.Model):
     status = db.Column(db.String(20), default='Pendente')
     observacoes = db.Column(db.Text, nullable=True)
     criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_reserva_area_data_status', 'area', 'data', 'status'),
+        db.Index('ix_reserva_data_horario', 'data', 'horario_inicio'),
+        db.Index('ix_reserva_morador_id', 'morador_id'),
+        db.Index('ix_reserva_status_data', 'status', 'data'),
+    )
+
+class AgendaArea(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    area = db.Column(db.String(100), nullable=False)
+    data = db.Column(db.Date, nullable=False)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('area', 'data', name='uq_agenda_area_data'),
+    )
 
 class Funcionario(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -108,9 +288,14 @@ class Notificacao(db.Model):
     mensagem = db.Column(db.Text, nullable=False)
     morador_id = db.Column(db.Integer, db.ForeignKey('morador.id'), nullable=True)
     autor_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
-    data_envio = db.Column(db.DateTime, default=datetime.utcnow)
+    data_envio = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     leituras = db.relationship('NotificacaoLeitura', backref='notificacao', lazy=True, cascade='all, delete-orphan')
+    envios = db.relationship('EnvioEmail', backref='notificacao', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.Index('ix_notificacao_morador_data_envio', 'morador_id', 'data_envio'),
+    )
 
 class NotificacaoLeitura(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -120,6 +305,26 @@ class NotificacaoLeitura(db.Model):
     
     __table_args__ = (
         db.UniqueConstraint('notificacao_id', 'usuario_id', name='uq_notificacao_leitura'),
+        db.Index('ix_notificacao_leitura_usuario', 'usuario_id', 'notificacao_id'),
+    )
+
+class NotificacaoMarcador(db.Model):
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), primary_key=True)
+    lida_ate_id = db.Column(db.Integer, nullable=False, default=0)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+class EnvioEmail(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    notificacao_id = db.Column(db.Integer, db.ForeignKey('notificacao.id'), nullable=False, index=True)
+    morador_id = db.Column(db.Integer, db.ForeignKey('morador.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='Pendente')
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    proxima_tentativa = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    enviado_em = db.Column(db.DateTime, nullable=True)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_envio_email_fila', 'status', 'proxima_tentativa'),
     )
 
 class ChatMensagem(db.Model):
@@ -129,6 +334,465 @@ class ChatMensagem(db.Model):
     mensagem = db.Column(db.Text, nullable=False)
     enviada_em = db.Column(db.DateTime, default=datetime.utcnow)
     lida_em = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_chat_mensagem_destinatario_lida', 'destinatario_id', 'lida_em'),
+        db.Index('ix_chat_mensagem_conversa', 'remetente_id', 'destinatario_id', 'enviada_em'),
+    )
+
+class ConversaResumo(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
+    contato_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
+    ultima_mensagem_id = db.Column(db.Integer, db.ForeignKey('chat_mensagem.id'), nullable=True)
+    ultima_data = db.Column(db.DateTime, nullable=True)
+    nao_lidas = db.Column(db.Integer, nullable=False, default=0)
+    
+    contato = db.relationship('Usuario', foreign_keys=[contato_id])
+    ultima_mensagem = db.relationship('ChatMensagem')
+    
+    __table_args__ = (
+        db.UniqueConstraint('usuario_id', 'contato_id', name='uq_conversa_resumo_usuario_contato'),
+        db.Index('ix_conversa_resumo_usuario_data', 'usuario_id', 'ultima_data'),
+    )
+
+class VersaoTabela(db.Model):
+    tabela = db.Column(db.String(50), primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+    atualizada_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+class RegistroAlteracao(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    tabela = db.Column(db.String(50), nullable=False)
+    registro_id = db.Column(db.Integer, nullable=False)
+    operacao = db.Column(db.String(10), nullable=False)
+    alterado_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TarefaAgendada(db.Model):
+    nome = db.Column(db.String(50), primary_key=True)
+    intervalo_segundos = db.Column(db.Integer, nullable=False)
+    ativa = db.Column(db.Boolean, nullable=False, default=True)
+    proxima_execucao = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    executando_ate = db.Column(db.DateTime, nullable=True)
+    ultima_execucao = db.Column(db.DateTime, nullable=True)
+    ultima_duracao_ms = db.Column(db.Integer, nullable=True)
+    ultimo_resultado = db.Column(db.Integer, nullable=True)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    falhas_consecutivas = db.Column(db.Integer, nullable=False, default=0)
+
+class MigracaoSchema(db.Model):
+    versao = db.Column(db.Integer, primary_key=True)
+    descricao = db.Column(db.String(200), nullable=False)
+    aplicada_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+MIGRACOES = [
+    (1, 'Índices de visitantes por entrada e por unidade/saída', [
+        'CREATE INDEX IF NOT EXISTS ix_visitante_data_entrada ON visitante (data_entrada)',
+        'CREATE INDEX IF NOT EXISTS ix_visitante_unidade_saida ON visitante (unidade_id, data_saida)',
+    ]),
+    (2, 'Índices das consultas frequentes', [
+        'CREATE INDEX IF NOT EXISTS ix_visitante_data_saida ON visitante (data_saida)',
+        'CREATE INDEX IF NOT EXISTS ix_morador_unidade_id ON morador (unidade_id)',
+        'CREATE INDEX IF NOT EXISTS ix_multa_status ON multa (status)',
+        'CREATE INDEX IF NOT EXISTS ix_multa_data_vencimento ON multa (data_vencimento)',
+        'CREATE INDEX IF NOT EXISTS ix_multa_morador_status ON multa (morador_id, status)',
+        'CREATE INDEX IF NOT EXISTS ix_reserva_area_data_status ON reserva (area, data, status)',
+        'CREATE INDEX IF NOT EXISTS ix_reserva_data_horario ON reserva (data, horario_inicio)',
+        'CREATE INDEX IF NOT EXISTS ix_reserva_morador_id ON reserva (morador_id)',
+        'CREATE INDEX IF NOT EXISTS ix_notificacao_data_envio ON notificacao (data_envio)',
+        'CREATE INDEX IF NOT EXISTS ix_notificacao_morador_data_envio ON notificacao (morador_id, data_envio)',
+        'CREATE INDEX IF NOT EXISTS ix_chat_mensagem_destinatario_lida ON chat_mensagem (destinatario_id, lida_em)',
+        'CREATE INDEX IF NOT EXISTS ix_chat_mensagem_conversa ON chat_mensagem (remetente_id, destinatario_id, enviada_em)',
+    ]),
+    (3, 'Resumo incremental das conversas do chat', [
+        lambda conexao: ConversaResumo.__table__.create(conexao, checkfirst=True),
+        lambda conexao: reconstruir_resumos_conversa(conexao),
+    ]),
+    (4, 'Marcador de leitura das notificações por usuário', [
+        lambda conexao: NotificacaoMarcador.__table__.create(conexao, checkfirst=True),
+        'CREATE INDEX IF NOT EXISTS ix_notificacao_leitura_usuario ON notificacao_leitura (usuario_id, notificacao_id)',
+    ]),
+    (5, 'Versões das tabelas para cache HTTP', [
+        lambda conexao: VersaoTabela.__table__.create(conexao, checkfirst=True),
+    ]),
+    (6, 'Registro de alterações para sincronização incremental', [
+        lambda conexao: RegistroAlteracao.__table__.create(conexao, checkfirst=True),
+        lambda conexao: registrar_estado_inicial_sincronizacao(conexao),
+    ]),
+    (7, 'Índice de visitantes por CPF', [
+        'CREATE INDEX IF NOT EXISTS ix_visitante_cpf ON visitante (cpf)',
+    ]),
+    (8, 'Busca textual (FTS5) de moradores, visitantes, notificações e chat', [
+        lambda conexao: criar_indices_busca(conexao),
+    ]),
+    (9, 'Valores de multas em centavos e saldos por morador e unidade', [
+        lambda conexao: converter_valores_multas(conexao),
+        lambda conexao: SaldoMultas.__table__.create(conexao, checkfirst=True),
+        lambda conexao: reconstruir_saldos_multas(conexao),
+    ]),
+    (10, 'Tarefas agendadas e índice de reservas por status', [
+        lambda conexao: TarefaAgendada.__table__.create(conexao, checkfirst=True),
+        'CREATE INDEX IF NOT EXISTS ix_reserva_status_data ON reserva (status, data)',
+    ]),
+    (11, 'Fila de envio de e-mails das notificações', [
+        lambda conexao: EnvioEmail.__table__.create(conexao, checkfirst=True),
+    ]),
+    (12, 'Contagem de visitantes por unidade', [
+        lambda conexao: ContagemVisitantes.__table__.create(conexao, checkfirst=True),
+        'CREATE INDEX IF NOT EXISTS ix_visitante_unidade_entrada ON visitante (unidade_id, data_entrada)',
+        lambda conexao: reconstruir_contagem_visitantes(conexao),
+    ]),
+    (13, 'Gatilhos da busca textual apenas nas colunas indexadas', [
+        lambda conexao: recriar_gatilhos_atualizacao_busca(conexao),
+    ]),
+]
+
+def converter_valores_multas(conexao):
+    colunas = {coluna['name'] for coluna in db.inspect(conexao).get_columns('multa')}
+    if 'valor_centavos' not in colunas:
+        conexao.exec_driver_sql('ALTER TABLE multa ADD COLUMN valor_centavos INTEGER NOT NULL DEFAULT 0')
+        conexao.exec_driver_sql('UPDATE multa SET valor_centavos = CAST(ROUND(valor * 100) AS INTEGER)')
+    if 'valor' in colunas:
+        conexao.exec_driver_sql('ALTER TABLE multa DROP COLUMN valor')
+
+def reconstruir_saldos_multas(conexao):
+    def somar(status, valor):
+        return db.func.coalesce(db.func.sum(db.case((Multa.status.in_(status), valor), else_=0)), 0)
+    
+    totais = [
+        somar(STATUS_MULTA_ABERTOS, 1),
+        somar(STATUS_MULTA_ABERTOS, Multa.valor_centavos),
+        somar(['Vencida'], 1),
+        somar(['Vencida'], Multa.valor_centavos),
+        somar(['Pago'], 1),
+        somar(['Pago'], Multa.valor_centavos)
+    ]
+    conexao.execute(db.delete(SaldoMultas))
+    for escopo, referencia in (('condominio', db.literal(0)), ('unidade', Morador.unidade_id), ('morador', Multa.morador_id)):
+        consulta = db.select(
+            db.literal(escopo), referencia, *totais, db.func.current_timestamp()
+        ).select_from(Multa).join(Morador, Morador.id == Multa.morador_id)
+        if escopo != 'condominio':
+            consulta = consulta.group_by(referencia)
+        conexao.execute(db.insert(SaldoMultas).from_select(
+            ['escopo', 'referencia_id', *CAMPOS_SALDO_MULTAS, 'atualizado_em'], consulta
+        ))
+
+def reconstruir_contagem_visitantes(conexao):
+    conexao.execute(db.delete(ContagemVisitantes))
+    conexao.execute(db.insert(ContagemVisitantes).from_select(
+        ['unidade_id', 'total'], db.select(db.literal(0), db.func.count(Visitante.id))
+    ))
+    conexao.execute(db.insert(ContagemVisitantes).from_select(
+        ['unidade_id', 'total'], db.select(Visitante.unidade_id, db.func.count(Visitante.id)).group_by(Visitante.unidade_id)
+    ))
+
+def reconstruir_resumos_conversa(conexao):
+    enviadas = db.select(
+        ChatMensagem.remetente_id.label('usuario_id'),
+        ChatMensagem.destinatario_id.label('contato_id'),
+        ChatMensagem.id.label('mensagem_id'),
+        ChatMensagem.enviada_em.label('enviada_em'),
+        db.literal(0).label('nao_lida')
+    )
+    recebidas = db.select(
+        ChatMensagem.destinatario_id,
+        ChatMensagem.remetente_id,
+        ChatMensagem.id,
+        ChatMensagem.enviada_em,
+        db.case((ChatMensagem.lida_em == None, 1), else_=0)
+    )
+    participacoes = db.union_all(enviadas, recebidas).subquery()
+    resumos = db.select(
+        participacoes.c.usuario_id,
+        participacoes.c.contato_id,
+        db.func.max(participacoes.c.mensagem_id),
+        db.func.max(participacoes.c.enviada_em),
+        db.func.sum(participacoes.c.nao_lida)
+    ).where(
+        participacoes.c.usuario_id != participacoes.c.contato_id
+    ).group_by(participacoes.c.usuario_id, participacoes.c.contato_id)
+    
+    conexao.execute(db.delete(ConversaResumo))
+    conexao.execute(db.insert(ConversaResumo).from_select(
+        ['usuario_id', 'contato_id', 'ultima_mensagem_id', 'ultima_data', 'nao_lidas'], resumos
+    ))
+
+def aplicar_migracoes():
+    MigracaoSchema.__table__.create(db.engine, checkfirst=True)
+    aplicadas = {versao for (versao,) in db.session.query(MigracaoSchema.versao)}
+    db.session.rollback()
+    
+    novas = []
+    for versao, descricao, passos in MIGRACOES:
+        if versao in aplicadas:
+            continue
+        try:
+            with db.engine.begin() as conexao:
+                for passo in passos:
+                    if callable(passo):
+                        passo(conexao)
+                    else:
+                        conexao.exec_driver_sql(passo)
+                conexao.execute(db.insert(MigracaoSchema).values(versao=versao, descricao=descricao))
+            novas.append(versao)
+        except IntegrityError:
+            continue
+    return novas
+
+PERFIS_CARREGAMENTO = {
+    'multas': lambda: [joinedload(Multa.morador).joinedload(Morador.unidade)],
+    'reservas': lambda: [joinedload(Reserva.morador).joinedload(Morador.unidade)],
+    'visitantes': lambda: [joinedload(Visitante.unidade)],
+    'unidades': lambda: [selectinload(Unidade.moradores)],
+    'moradores': lambda: [contains_eager(Morador.unidade)],
+    'moradores_com_unidade': lambda: [joinedload(Morador.unidade)],
+    'notificacoes': lambda: [joinedload(Notificacao.morador).joinedload(Morador.unidade)],
+    'usuarios_chat': lambda: [joinedload(Usuario.morador).joinedload(Morador.unidade)],
+    'usuario_atual': lambda: [joinedload(Usuario.morador).joinedload(Morador.unidade)],
+    'conversas': lambda: [
+        joinedload(ConversaResumo.contato).joinedload(Usuario.morador).joinedload(Morador.unidade),
+        joinedload(ConversaResumo.ultima_mensagem)
+    ],
+    'inadimplencia': lambda: [joinedload(SaldoMultas.unidade)]
+}
+
+ORCAMENTO_CONSULTAS = {
+    'index': 6,
+    'perfil': 6,
+    'listar_unidades': 6,
+    'listar_moradores': 5,
+    'listar_visitantes': 7,
+    'cadastrar_visitante': 6,
+    'listar_multas': 6,
+    'cadastrar_multa': 6,
+    'listar_reservas': 6,
+    'cadastrar_reserva': 6,
+    'listar_notificacoes': 8,
+    'cadastrar_notificacao': 6,
+    'chat_home': 8,
+    'chat_conversa': 10
+}
+
+def com_perfil(query, perfil):
+    return query.options(*PERFIS_CARREGAMENTO[perfil]())
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def contar_consultas(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('inicio_consultas', []).append(time.perf_counter())
+    if has_request_context():
+        g.consultas_sql = g.get('consultas_sql', 0) + 1
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def medir_consulta(conn, cursor, statement, parameters, context, executemany):
+    duracao = time.perf_counter() - conn.info['inicio_consultas'].pop()
+    endpoint = None
+    if has_request_context():
+        g.tempo_sql = g.get('tempo_sql', 0.0) + duracao
+        endpoint = request.endpoint
+    limite = app.config['CONSULTA_LENTA_MS']
+    if limite and duracao * 1000 >= limite:
+        registrar_consulta_lenta(statement, duracao, endpoint)
+
+@event.listens_for(Engine, 'handle_error')
+def descartar_medicao_consulta(contexto):
+    if contexto.connection is None or contexto.execution_context is None:
+        return
+    inicios = contexto.connection.info.get('inicio_consultas')
+    if inicios:
+        inicios.pop()
+
+@app.after_request
+def verificar_orcamento_consultas(response):
+    if not app.config['QUERY_BUDGET_ENFORCE']:
+        return response
+    orcamento = ORCAMENTO_CONSULTAS.get(request.endpoint)
+    consultas = g.get('consultas_sql', 0)
+    if orcamento is not None and consultas > orcamento:
+        raise AssertionError(
+            f'{request.endpoint} executou {consultas} consultas SQL (orçamento: {orcamento})'
+        )
+    return response
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+def formatar_rotulos(rotulos):
+    if not rotulos:
+        return ''
+    pares = []
+    for nome, valor in rotulos:
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pares.append(f'{nome}="{valor}"')
+    return '{' + ','.join(pares) + '}'
+
+class MetricasMemoria:
+    def __init__(self):
+        self.definicoes = {}
+        self.series = {}
+        self.lock = threading.Lock()
+    
+    def definir(self, nome, tipo, descricao, buckets=None):
+        self.definicoes[nome] = (tipo, descricao, buckets)
+        self.series[nome] = {}
+    
+    def incrementar(self, nome, rotulos, valor=1):
+        with self.lock:
+            serie = self.series[nome]
+            serie[rotulos] = serie.get(rotulos, 0) + valor
+    
+    def observar(self, nome, rotulos, valor):
+        buckets = self.definicoes[nome][2]
+        posicao = bisect.bisect_left(buckets, valor)
+        with self.lock:
+            serie = self.series[nome]
+            if rotulos not in serie:
+                serie[rotulos] = [[0] * (len(buckets) + 1), 0]
+            contagens = serie[rotulos]
+            contagens[0][posicao] += 1
+            contagens[1] += valor
+    
+    def limpar(self):
+        with self.lock:
+            for serie in self.series.values():
+                serie.clear()
+    
+    def exportar(self):
+        with self.lock:
+            series = {
+                nome: {rotulos: [list(valor[0]), valor[1]] if isinstance(valor, list) else valor for rotulos, valor in serie.items()}
+                for nome, serie in self.series.items()
+            }
+        linhas = []
+        for nome, (tipo, descricao, buckets) in self.definicoes.items():
+            linhas.append(f'# HELP {nome} {descricao}')
+            linhas.append(f'# TYPE {nome} {tipo}')
+            for rotulos, valor in sorted(series[nome].items()):
+                if tipo == 'counter':
+                    linhas.append(f'{nome}{formatar_rotulos(rotulos)} {valor}')
+                    continue
+                contagens, soma = valor
+                acumulado = 0
+                for limite, contagem in zip(buckets + ('+Inf',), contagens):
+                    acumulado += contagem
+                    linhas.append(f'{nome}_bucket{formatar_rotulos(rotulos + (("le", limite),))} {acumulado}')
+                linhas.append(f'{nome}_sum{formatar_rotulos(rotulos)} {soma}')
+                linhas.append(f'{nome}_count{formatar_rotulos(rotulos)} {acumulado}')
+        return '\n'.join(linhas) + '\n'
+
+metricas = MetricasMemoria()
+metricas.definir('condominio_requisicoes_total', 'counter', 'Requisições HTTP atendidas.')
+metricas.definir('condominio_requisicao_segundos', 'histogram', 'Latência das requisições HTTP por endpoint.', BUCKETS_LATENCIA)
+metricas.definir('condominio_requisicao_consultas_sql', 'histogram', 'Consultas SQL executadas por requisição.', BUCKETS_CONSULTAS)
+metricas.definir('condominio_requisicao_sql_segundos', 'histogram', 'Tempo gasto em SQL por requisição.', BUCKETS_LATENCIA)
+metricas.definir('condominio_template_segundos', 'histogram', 'Tempo de renderização dos templates.', BUCKETS_LATENCIA)
+metricas.definir('condominio_template_consultas_sql', 'histogram', 'Consultas SQL executadas durante a renderização dos templates.', BUCKETS_CONSULTAS)
+metricas.definir('condominio_consultas_lentas_total', 'counter', 'Consultas SQL acima de CONSULTA_LENTA_MS.')
+
+@app.before_request
+def iniciar_medicao_requisicao():
+    g.inicio_requisicao = time.perf_counter()
+    g.consultas_sql = 0
+    g.tempo_sql = 0.0
+
+@app.after_request
+def registrar_metricas_requisicao(response):
+    if 'inicio_requisicao' not in g:
+        return response
+    rotulos = (('endpoint', request.endpoint or 'desconhecido'),)
+    metricas.incrementar(
+        'condominio_requisicoes_total',
+        rotulos + (('metodo', request.method), ('status', response.status_code))
+    )
+    metricas.observar('condominio_requisicao_segundos', rotulos, time.perf_counter() - g.pop('inicio_requisicao'))
+    metricas.observar('condominio_requisicao_consultas_sql', rotulos, g.get('consultas_sql', 0))
+    metricas.observar('condominio_requisicao_sql_segundos', rotulos, g.get('tempo_sql', 0.0))
+    return response
+
+@before_render_template.connect_via(app)
+def iniciar_medicao_template(sender, template, context, **extra):
+    g.setdefault('medicoes_template', []).append((time.perf_counter(), g.get('consultas_sql', 0)))
+
+@template_rendered.connect_via(app)
+def registrar_metricas_template(sender, template, context, **extra):
+    medicoes = g.get('medicoes_template')
+    if not medicoes:
+        return
+    inicio, consultas = medicoes.pop()
+    rotulos = (('template', template.name or 'string'),)
+    metricas.observar('condominio_template_segundos', rotulos, time.perf_counter() - inicio)
+    metricas.observar('condominio_template_consultas_sql', rotulos, g.get('consultas_sql', 0) - consultas)
+
+identidades_cache = {}
+identidades_cache_lock = threading.Lock()
+
+@app.before_request
+def limpar_usuario_atual():
+    g.pop('usuario_atual', None)
+
+def usuario_atual():
+    if 'usuario_atual' not in g:
+        usuario_id = session.get('user_id')
+        g.usuario_atual = None
+        if usuario_id is not None:
+            g.usuario_atual = com_perfil(Usuario.query, 'usuario_atual').filter_by(id=usuario_id).first()
+    return g.usuario_atual
+
+def identidade_atual():
+    usuario_id = session.get('user_id')
+    if usuario_id is None:
+        return None
+    
+    agora = time.monotonic()
+    versao = db.session.query(VersaoTabela.versao).filter(VersaoTabela.tabela == 'usuario').scalar() or 0
+    entrada = identidades_cache.get(usuario_id)
+    if entrada and entrada[0] > agora and entrada[1] == versao:
+        return entrada[2]
+    
+    usuario = usuario_atual()
+    if not usuario:
+        return None
+    identidade = {
+        'id': usuario.id,
+        'username': usuario.username,
+        'tipo': usuario.tipo,
+        'morador_id': usuario.morador_id,
+        'ativo': usuario.ativo
+    }
+    if app.config['USUARIO_CACHE_TTL']:
+        with identidades_cache_lock:
+            identidades_cache[usuario_id] = (agora + app.config['USUARIO_CACHE_TTL'], versao, identidade)
+    return identidade
+
+def invalidar_identidades(*usuarios_ids):
+    with identidades_cache_lock:
+        if not usuarios_ids:
+            identidades_cache.clear()
+            return
+        for usuario_id in usuarios_ids:
+            identidades_cache.pop(usuario_id, None)
+
+@event.listens_for(Usuario, 'after_update')
+@event.listens_for(Usuario, 'after_delete')
+def registrar_usuario_alterado(mapper, connection, target):
+    db.session.info.setdefault('usuarios_alterados', set()).add(target.id)
+    db.session.info['versionar_usuarios'] = True
+
+@event.listens_for(db.session, 'after_flush')
+def versionar_usuarios_alterados(sessao, contexto):
+    if sessao.info.pop('versionar_usuarios', None):
+        incrementar_versoes_tabelas(['usuario'])
+
+@event.listens_for(db.session, 'after_commit')
+def invalidar_usuarios_alterados(sessao):
+    alterados = sessao.info.pop('usuarios_alterados', None)
+    if alterados:
+        invalidar_identidades(*alterados)
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def descartar_usuarios_alterados(sessao, transacao_anterior):
+    sessao.info.pop('usuarios_alterados', None)
+    sessao.info.pop('versionar_usuarios', None)
 
 def login_required(f):
     from functools import wraps
@@ -145,31 +809,22 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             return redirect(url_for('login'))
-        usuario = Usuario.query.get(session['user_id'])
-        if not usuario or usuario.tipo != 'Admin':
+        identidade = identidade_atual()
+        if not identidade or identidade['tipo'] != 'Admin':
             flash('Acesso negado. Apenas administradores podem acessar esta página.', 'error')
             return redirect(url_for('index'))
         return f(*args, **kwargs)
     return decorated_function
 
-@app.context_processor
-def inject_badges():
-    if 'user_id' not in session:
-        return {'notificacoes_nao_lidas': 0, 'chat_nao_lidas': 0}
-    
-    usuario = Usuario.query.get(session['user_id'])
+badges_cache = {}
+badges_cache_lock = threading.Lock()
+
+def calcular_badges(usuario_id):
+    usuario = db.session.get(Usuario, usuario_id)
     if not usuario:
         return {'notificacoes_nao_lidas': 0, 'chat_nao_lidas': 0}
     
-    notificacoes_query = Notificacao.query
-    if usuario.tipo != 'Admin':
-        notificacoes_query = notificacoes_query.filter(
-            or_(Notificacao.morador_id == None, Notificacao.morador_id == usuario.morador_id)
-        )
-    
-    notificacoes_nao_lidas = notificacoes_query.filter(
-        ~Notificacao.leituras.any(NotificacaoLeitura.usuario_id == usuario.id)
-    ).count()
+    notificacoes_nao_lidas = consulta_notificacoes_nao_lidas(usuario).count()
     
     chat_nao_lidas = ChatMensagem.query.filter_by(destinatario_id=usuario.id, lida_em=None).count()
     
@@ -178,50 +833,423 @@ def inject_badges():
         'chat_nao_lidas': chat_nao_lidas
     }
 
+def obter_badges(usuario_id):
+    agora = time.monotonic()
+    entrada = badges_cache.get(usuario_id)
+    if entrada and entrada[0] > agora:
+        return entrada[1]
+    
+    badges = calcular_badges(usuario_id)
+    with badges_cache_lock:
+        badges_cache[usuario_id] = (agora + app.config['BADGES_CACHE_TTL'], badges)
+    return badges
+
+def invalidar_badges(*usuarios_ids):
+    with badges_cache_lock:
+        if not usuarios_ids:
+            badges_cache.clear()
+            return
+        for usuario_id in usuarios_ids:
+            badges_cache.pop(usuario_id, None)
+
+@app.context_processor
+def inject_badges():
+    if 'user_id' not in session:
+        return {'notificacoes_nao_lidas': 0, 'chat_nao_lidas': 0}
+    return dict(obter_badges(session['user_id']))
+
+ORDENACAO_VISITANTES = [(Visitante.data_entrada, True), (Visitante.id, True)]
+ORDENACAO_MULTAS = [(Multa.data_vencimento, True), (Multa.id, True)]
+ORDENACAO_RESERVAS = [(Reserva.data, True), (Reserva.horario_inicio, False), (Reserva.id, False)]
+ORDENACAO_NOTIFICACOES = [(Notificacao.data_envio, True), (Notificacao.id, True)]
+ORDENACAO_MENSAGENS = [(ChatMensagem.enviada_em, True), (ChatMensagem.id, True)]
+
+def codificar_cursor(valores):
+    valores = [valor.isoformat() if isinstance(valor, (datetime, date, dt_time)) else valor for valor in valores]
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip('=')
+
+def decodificar_cursor(cursor, ordenacao):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(valores, list) or len(valores) != len(ordenacao):
+            raise ValueError(cursor)
+        decodificados = []
+        for (coluna, _), valor in zip(ordenacao, valores):
+            tipo = coluna.type.python_type
+            decodificados.append(tipo.fromisoformat(valor) if tipo in (datetime, date, dt_time) else tipo(valor))
+        return decodificados
+    except (ValueError, TypeError, binascii.Error):
+        abort(400, description='Cursor de paginação inválido.')
+
+def tamanho_pagina():
+    tamanho = request.args.get('limite', type=int) or app.config['PAGE_SIZE']
+    return max(1, min(tamanho, app.config['PAGE_SIZE_MAX']))
+
+def paginar(query, ordenacao, cursor=None, tamanho=None):
+    tamanho = tamanho or tamanho_pagina()
+    query = query.order_by(*[coluna.desc() if descendente else coluna.asc() for coluna, descendente in ordenacao])
+    
+    if cursor:
+        valores = decodificar_cursor(cursor, ordenacao)
+        condicoes = []
+        for indice, (coluna, descendente) in enumerate(ordenacao):
+            anteriores = [c == v for (c, _), v in zip(ordenacao[:indice], valores[:indice])]
+            limite = coluna < valores[indice] if descendente else coluna > valores[indice]
+            condicoes.append(and_(*anteriores, limite))
+        query = query.filter(or_(*condicoes))
+    
+    itens = query.limit(tamanho + 1).all()
+    proximo_cursor = None
+    if len(itens) > tamanho:
+        itens = itens[:tamanho]
+        proximo_cursor = codificar_cursor([getattr(itens[-1], coluna.key) for coluna, _ in ordenacao])
+    return itens, proximo_cursor
+
+def resposta_paginada(itens, proximo_cursor, serializar):
+    return jsonify({
+        'itens': [serializar(item) for item in itens],
+        'proximo_cursor': proximo_cursor
+    })
+
+def consulta_visitantes(usuario):
+    consulta = Visitante.query
+    if usuario.tipo != 'Admin':
+        consulta = consulta.filter_by(unidade_id=usuario.morador.unidade_id)
+    return consulta
+
+def consulta_multas(usuario):
+    consulta = Multa.query
+    if usuario.tipo != 'Admin':
+        consulta = consulta.filter_by(morador_id=usuario.morador_id)
+    return consulta
+
+def consulta_reservas(usuario):
+    consulta = Reserva.query
+    if usuario.tipo != 'Admin':
+        consulta = consulta.filter_by(morador_id=usuario.morador_id)
+    return consulta
+
+def consulta_notificacoes(usuario):
+    consulta = Notificacao.query
+    if usuario.tipo != 'Admin':
+        consulta = consulta.filter(
+            or_(Notificacao.morador_id == None, Notificacao.morador_id == usuario.morador_id)
+        )
+    return consulta
+
+def marcador_leitura(usuario):
+    return db.session.query(NotificacaoMarcador.lida_ate_id).filter(
+        NotificacaoMarcador.usuario_id == usuario.id
+    ).scalar_subquery()
+
+def consulta_notificacoes_nao_lidas(usuario):
+    return consulta_notificacoes(usuario).filter(
+        Notificacao.id > db.func.coalesce(marcador_leitura(usuario), 0),
+        ~Notificacao.leituras.any(NotificacaoLeitura.usuario_id == usuario.id)
+    )
+
+def marcar_todas_notificacoes_lidas(usuario, ate_id):
+    inserir_ou_atualizar(
+        NotificacaoMarcador,
+        [{'usuario_id': usuario.id, 'lida_ate_id': ate_id, 'atualizado_em': datetime.utcnow()}],
+        ['usuario_id'],
+        lambda novo: {
+            'lida_ate_id': db.case(
+                (novo.lida_ate_id > NotificacaoMarcador.lida_ate_id, novo.lida_ate_id),
+                else_=NotificacaoMarcador.lida_ate_id
+            ),
+            'atualizado_em': novo.atualizado_em
+        }
+    )
+    NotificacaoLeitura.query.filter(
+        NotificacaoLeitura.usuario_id == usuario.id,
+        NotificacaoLeitura.notificacao_id <= ate_id
+    ).delete(synchronize_session=False)
+
+def marcar_notificacoes_lidas(usuario, notificacao_ids):
+    ids_validos = [
+        notificacao_id
+        for (notificacao_id,) in consulta_notificacoes_nao_lidas(usuario).filter(
+            Notificacao.id.in_(notificacao_ids)
+        ).with_entities(Notificacao.id)
+    ]
+    if ids_validos:
+        inserir_ignorando_conflito(NotificacaoLeitura, [
+            {'notificacao_id': notificacao_id, 'usuario_id': usuario.id}
+            for notificacao_id in ids_validos
+        ])
+    return len(ids_validos)
+
+def consulta_mensagens_conversa(usuario, destinatario):
+    return ChatMensagem.query.filter(
+        or_(
+            and_(ChatMensagem.remetente_id == usuario.id, ChatMensagem.destinatario_id == destinatario.id),
+            and_(ChatMensagem.remetente_id == destinatario.id, ChatMensagem.destinatario_id == usuario.id)
+        )
+    )
+
+def calcular_estatisticas_visitantes(usuario):
+    inicio_hoje = datetime.combine(date.today(), dt_time.min)
+    unidade_id = 0 if usuario.tipo == 'Admin' else usuario.morador.unidade_id
+    escopo = [Visitante.unidade_id == unidade_id] if unidade_id else []
+    
+    def contar(*filtros):
+        return db.select(db.func.count(Visitante.id)).where(*escopo, *filtros).scalar_subquery()
+    
+    total, ativos, hoje = db.session.query(
+        db.select(ContagemVisitantes.total).where(ContagemVisitantes.unidade_id == unidade_id).scalar_subquery(),
+        contar(Visitante.data_saida == None),
+        contar(Visitante.data_entrada >= inicio_hoje, Visitante.data_entrada < inicio_hoje + timedelta(days=1))
+    ).one()
+    
+    total = total or 0
+    ativos = ativos or 0
+    return {
+        'total_visitantes': total,
+        'visitantes_ativos': ativos,
+        'visitantes_finalizados': total - ativos,
+        'visitantes_hoje': hoje or 0
+    }
+
+def serializar_unidade(u):
+    return {
+        'id': u.id,
+        'numero': u.numero,
+        'bloco': u.bloco,
+        'tipo': u.tipo,
+        'vagas_garagem': u.vagas_garagem
+    }
+
+def serializar_morador(m):
+    return {
+        'id': m.id,
+        'nome': m.nome,
+        'cpf': m.cpf,
+        'telefone': m.telefone,
+        'email': m.email,
+        'tipo': m.tipo,
+        'unidade_id': m.unidade_id,
+        'unidade': f"{m.unidade.bloco} - {m.unidade.numero}"
+    }
+
+def serializar_visitante(v):
+    return {
+        'id': v.id,
+        'nome': v.nome,
+        'cpf': v.cpf,
+        'telefone': v.telefone,
+        'unidade_id': v.unidade_id,
+        'unidade': f"{v.unidade.bloco} - {v.unidade.numero}",
+        'data_entrada': v.data_entrada.isoformat(),
+        'data_saida': v.data_saida.isoformat() if v.data_saida else None,
+        'observacoes': v.observacoes
+    }
+
+def serializar_multa(m):
+    return {
+        'id': m.id,
+        'morador_id': m.morador_id,
+        'morador': m.morador.nome,
+        'unidade': f"{m.morador.unidade.bloco} - {m.morador.unidade.numero}",
+        'valor': str(m.valor),
+        'valor_centavos': m.valor_centavos,
+        'descricao': m.descricao,
+        'data_vencimento': m.data_vencimento.isoformat(),
+        'data_pagamento': m.data_pagamento.isoformat() if m.data_pagamento else None,
+        'status': m.status
+    }
+
+def serializar_reserva(r):
+    return {
+        'id': r.id,
+        'morador_id': r.morador_id,
+        'morador': r.morador.nome,
+        'unidade': f"{r.morador.unidade.bloco} - {r.morador.unidade.numero}",
+        'area': r.area,
+        'data': r.data.isoformat(),
+        'horario_inicio': r.horario_inicio.strftime('%H:%M'),
+        'horario_fim': r.horario_fim.strftime('%H:%M'),
+        'status': r.status,
+        'observacoes': r.observacoes
+    }
+
+def serializar_notificacao(n):
+    return {
+        'id': n.id,
+        'titulo': n.titulo,
+        'mensagem': n.mensagem,
+        'morador_id': n.morador_id,
+        'data_envio': n.data_envio.isoformat()
+    }
+
+def serializar_mensagem(m):
+    return {
+        'id': m.id,
+        'remetente_id': m.remetente_id,
+        'destinatario_id': m.destinatario_id,
+        'mensagem': m.mensagem,
+        'enviada_em': m.enviada_em.isoformat(),
+        'lida_em': m.lida_em.isoformat() if m.lida_em else None
+    }
+
+def contar(modelo, *filtros):
+    return db.select(db.func.count(modelo.id)).where(*filtros).scalar_subquery()
+
+def saldo_multas_coluna(campo, escopo, referencia_id):
+    return db.select(getattr(SaldoMultas, campo)).where(
+        SaldoMultas.escopo == escopo, SaldoMultas.referencia_id == referencia_id
+    ).scalar_subquery()
+
+def calcular_estatisticas_dashboard(usuario):
+    if usuario.tipo == 'Admin':
+        colunas = {
+            'total_unidades': contar(Unidade),
+            'total_moradores': contar(Morador),
+            'visitantes_ativos': contar(Visitante, Visitante.data_saida == None),
+            'multas_pendentes': saldo_multas_coluna('multas_abertas', 'condominio', 0),
+            'valor_multas': saldo_multas_coluna('aberto_centavos', 'condominio', 0),
+            'reservas_pendentes': contar(Reserva, Reserva.status == 'Pendente'),
+            'funcionarios_ativos': contar(Funcionario, Funcionario.ativo == True),
+            'notificacoes_totais': contar(Notificacao)
+        }
+    else:
+        unidade_id = db.select(Morador.unidade_id).where(Morador.id == usuario.morador_id).scalar_subquery()
+        colunas = {
+            'moradores_unidade': contar(Morador, Morador.unidade_id == unidade_id),
+            'visitantes_ativos': contar(Visitante, Visitante.unidade_id == unidade_id, Visitante.data_saida == None),
+            'multas_abertas': saldo_multas_coluna('multas_abertas', 'morador', usuario.morador_id),
+            'valor_multas': saldo_multas_coluna('aberto_centavos', 'morador', usuario.morador_id),
+            'reservas_realizadas': contar(Reserva, Reserva.morador_id == usuario.morador_id),
+            'notificacoes_disponiveis': contar(
+                Notificacao,
+                or_(Notificacao.morador_id == None, Notificacao.morador_id == usuario.morador_id)
+            )
+        }
+    
+    linha = db.session.execute(
+        db.select(*[coluna.label(nome) for nome, coluna in colunas.items()])
+    ).one()
+    estatisticas = {nome: valor or 0 for nome, valor in linha._mapping.items()}
+    estatisticas['valor_multas'] = Decimal(estatisticas['valor_multas']).scaleb(-2)
+    return estatisticas
+
 @app.route('/')
 def index():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    usuario = Usuario.query.get(session['user_id'])
-    unidades = Unidade.query.all()
-    moradores = Morador.query.all()
-    
-    if usuario.tipo == 'Admin':
-        visitantes_ativos = Visitante.query.filter_by(data_saida=None).count()
-        multas_pendentes = Multa.query.filter_by(status='Pendente').count()
-        valor_multas = db.session.query(db.func.sum(Multa.valor)).filter_by(status='Pendente').scalar() or 0
-        reservas_pendentes = Reserva.query.filter_by(status='Pendente').count()
-        funcionarios_ativos = Funcionario.query.filter_by(ativo=True).count()
-        notificacoes_totais = Notificacao.query.count()
-        
-        return render_template('index.html', 
-                             unidades=unidades, 
-                             moradores=moradores,
-                             visitantes_ativos=visitantes_ativos,
-                             multas_pendentes=multas_pendentes,
-                             valor_multas=valor_multas,
-                             reservas_pendentes=reservas_pendentes,
-                             funcionarios_ativos=funcionarios_ativos,
-                             notificacoes_totais=notificacoes_totais)
-    
-    else:
-        moradores_unidade = Morador.query.filter_by(unidade_id=usuario.morador.unidade_id).count()
-        visitantes_ativos = Visitante.query.filter_by(unidade_id=usuario.morador.unidade_id, data_saida=None).count()
-        multas_abertas = Multa.query.filter_by(morador_id=usuario.morador_id, status='Pendente').count()
-        valor_multas = db.session.query(db.func.sum(Multa.valor)).filter_by(morador_id=usuario.morador_id, status='Pendente').scalar() or 0
-        reservas_realizadas = Reserva.query.filter_by(morador_id=usuario.morador_id).count()
-        notificacoes_disponiveis = Notificacao.query.filter(or_(Notificacao.morador_id == None, Notificacao.morador_id == usuario.morador_id)).count()
-        
-        return render_template('index.html', 
-                             unidades=unidades, 
-                             moradores=moradores,
-                             moradores_unidade=moradores_unidade,
-                             visitantes_ativos=visitantes_ativos,
-                             multas_abertas=multas_abertas,
-                             valor_multas=valor_multas,
-                             reservas_realizadas=reservas_realizadas,
-                             notificacoes_disponiveis=notificacoes_disponiveis)
+    usuario = usuario_atual()
+    estatisticas = calcular_estatisticas_dashboard(usuario)
+    return render_template('index.html', **estatisticas)
+
+def gerar_hash_senha(senha):
+    return generate_password_hash(
+        senha,
+        method=app.config['SENHA_HASH_METODO'],
+        salt_length=app.config['SENHA_SALT_TAMANHO']
+    )
+
+@functools.lru_cache(maxsize=4)
+def prefixo_hash(metodo):
+    return generate_password_hash('', method=metodo, salt_length=1).split('$', 1)[0]
+
+def hash_precisa_atualizar(senha_hash):
+    return senha_hash.split('$', 1)[0] != prefixo_hash(app.config['SENHA_HASH_METODO'])
+
+class LimitadorMemoria:
+    def __init__(self, max_chaves=10000):
+        self.max_chaves = max_chaves
+        self.baldes = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def consumir(self, chave, capacidade, janela):
+        agora = time.monotonic()
+        reposicao = capacidade / janela
+        with self.lock:
+            tokens, atualizado = self.baldes.get(chave, (capacidade, agora))
+            tokens = min(capacidade, tokens + (agora - atualizado) * reposicao)
+            permitido = tokens >= 1
+            if permitido:
+                tokens -= 1
+            self.baldes[chave] = (tokens, agora)
+            self.baldes.move_to_end(chave)
+            while len(self.baldes) > self.max_chaves:
+                self.baldes.popitem(last=False)
+        return permitido
+    
+    def reiniciar(self, chave):
+        with self.lock:
+            self.baldes.pop(chave, None)
+
+limitador_login = LimitadorMemoria()
+
+class FormatadorJson(logging.Formatter):
+    def format(self, registro):
+        return json.dumps({
+            'momento': datetime.utcfromtimestamp(registro.created).isoformat() + 'Z',
+            'nivel': registro.levelname,
+            'evento': registro.getMessage(),
+            **getattr(registro, 'dados', {})
+        }, ensure_ascii=False)
+
+fila_log = queue.SimpleQueue()
+manipulador_log = QueueHandler(fila_log)
+log_autenticacao = logging.getLogger('condominio.autenticacao')
+log_consultas = logging.getLogger('condominio.consultas')
+log_tarefas = logging.getLogger('condominio.tarefas')
+for logger in (log_autenticacao, log_consultas, log_tarefas):
+    logger.setLevel(logging.INFO)
+ouvinte_log = None
+limitador_log_consultas = LimitadorMemoria(max_chaves=1000)
+
+def iniciar_logs():
+    global ouvinte_log
+    if ouvinte_log and ouvinte_log.pid == os.getpid():
+        return
+    saida = logging.StreamHandler()
+    saida.setFormatter(FormatadorJson())
+    ouvinte = QueueListener(fila_log, saida)
+    ouvinte.pid = os.getpid()
+    ouvinte.start()
+    ouvinte_log = ouvinte
+    for logger in (log_autenticacao, log_consultas, log_tarefas):
+        if manipulador_log not in logger.handlers:
+            logger.addHandler(manipulador_log)
+        logger.propagate = False
+
+def registrar_consulta_lenta(statement, duracao, endpoint):
+    metricas.incrementar('condominio_consultas_lentas_total', (('endpoint', endpoint or 'fora_de_requisicao'),))
+    if not limitador_log_consultas.consumir(
+        statement,
+        app.config['CONSULTA_LENTA_LOG_CAPACIDADE'],
+        app.config['CONSULTA_LENTA_LOG_JANELA']
+    ):
+        return
+    log_consultas.warning('consulta_lenta', extra={'dados': {
+        'duracao_ms': round(duracao * 1000, 1),
+        'endpoint': endpoint,
+        'sql': ' '.join(statement.split())[:2000]
+    }})
+
+def registrar_evento_autenticacao(evento, username, nivel=logging.INFO, **dados):
+    log_autenticacao.log(nivel, evento, extra={'dados': {
+        'username': username,
+        'ip': request.remote_addr,
+        **dados
+    }})
+
+def login_permitido(username):
+    if not limitador_login.consumir(
+        f'ip:{request.remote_addr}',
+        app.config['LOGIN_LIMITE_IP_CAPACIDADE'],
+        app.config['LOGIN_LIMITE_IP_JANELA']
+    ):
+        return False
+    return limitador_login.consumir(
+        f'usuario:{username.lower()}',
+        app.config['LOGIN_LIMITE_USUARIO_CAPACIDADE'],
+        app.config['LOGIN_LIMITE_USUARIO_JANELA']
+    )
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -229,29 +1257,37 @@ def login():
         username = request.form.get('username', '').strip()
         senha = request.form.get('senha', '').strip()
         
-        print(f"Tentativa de login: username='{username}', senha='{senha}'")
-        
         if not username or not senha:
             flash('Por favor, preencha todos os campos!', 'error')
             return render_template('login.html')
         
+        if not login_permitido(username):
+            registrar_evento_autenticacao('login_bloqueado', username, logging.WARNING)
+            flash('Muitas tentativas de login. Aguarde alguns minutos e tente novamente.', 'error')
+            return render_template('login.html'), 429
+        
         usuario = Usuario.query.filter_by(username=username, ativo=True).first()
         
         if usuario:
-            print(f"Usuário encontrado: {usuario.username}, tipo: {usuario.tipo}")
             senha_valida = check_password_hash(usuario.senha_hash, senha)
-            print(f"Senha válida: {senha_valida}")
             
             if senha_valida:
+                if hash_precisa_atualizar(usuario.senha_hash):
+                    usuario.senha_hash = gerar_hash_senha(senha)
+                    db.session.commit()
+                    registrar_evento_autenticacao('senha_rehash', username, metodo=app.config['SENHA_HASH_METODO'])
+                limitador_login.reiniciar(f'usuario:{username.lower()}')
                 session['user_id'] = usuario.id
                 session['username'] = usuario.username
                 session['tipo'] = usuario.tipo
+                registrar_evento_autenticacao('login_sucesso', username, usuario_id=usuario.id)
                 flash(f'Bem-vindo, {usuario.username}!', 'success')
                 return redirect(url_for('index'))
             else:
+                registrar_evento_autenticacao('login_falha', username, logging.WARNING, motivo='senha_incorreta')
                 flash('Senha incorreta!', 'error')
         else:
-            print(f"Usuário não encontrado: {username}")
+            registrar_evento_autenticacao('login_falha', username, logging.WARNING, motivo='usuario_inexistente')
             flash('Usuário não encontrado!', 'error')
     
     return render_template('login.html')
@@ -265,7 +1301,7 @@ def logout():
 @app.route('/perfil')
 @login_required
 def perfil():
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = usuario_atual()
     return render_template('perfil.html', usuario=usuario)
 
 @app.route('/cadastrar_unidade', methods=['GET', 'POST'])
@@ -309,39 +1345,285 @@ def cadastrar_morador():
     unidades = Unidade.query.all()
     return render_template('cadastrar_morador.html', unidades=unidades)
 
+COLUNAS_IMPORTACAO = {
+    'unidades': ['numero', 'bloco', 'tipo', 'vagas_garagem'],
+    'moradores': ['nome', 'cpf', 'telefone', 'email', 'tipo', 'unidade']
+}
+
+def ler_csv(arquivo):
+    amostra = arquivo.read(4096)
+    arquivo.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra.decode('utf-8-sig', errors='ignore'), delimiters=',;')
+    except csv.Error:
+        dialeto = csv.excel
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    leitor = csv.DictReader(texto, dialect=dialeto)
+    for linha in leitor:
+        yield leitor.line_num, {
+            (chave or '').strip().lower(): (valor or '').strip()
+            for chave, valor in linha.items()
+            if chave is not None
+        }
+
+def validar_unidade_importada(linha, numeros_cadastrados):
+    numero = linha.get('numero', '')
+    bloco = linha.get('bloco', '')
+    tipo = linha.get('tipo', '')
+    if not numero or not bloco or not tipo:
+        return None, 'Campos obrigatórios: numero, bloco e tipo.'
+    if numero.casefold() in numeros_cadastrados:
+        return None, f'Unidade {numero} já cadastrada.'
+    try:
+        vagas_garagem = int(linha.get('vagas_garagem') or 0)
+    except ValueError:
+        return None, 'vagas_garagem deve ser um número inteiro.'
+    
+    numeros_cadastrados.add(numero.casefold())
+    return {'numero': numero, 'bloco': bloco, 'tipo': tipo, 'vagas_garagem': vagas_garagem}, None
+
+def validar_morador_importado(linha, cpfs_cadastrados, unidades_por_numero):
+    campos = {campo: linha.get(campo, '') for campo in ['nome', 'cpf', 'telefone', 'email', 'tipo']}
+    if not all(campos.values()):
+        return None, 'Campos obrigatórios: nome, cpf, telefone, email e tipo.'
+    if campos['cpf'] in cpfs_cadastrados:
+        return None, f'CPF {campos["cpf"]} já cadastrado.'
+    unidade_id = unidades_por_numero.get(linha.get('unidade', '').casefold())
+    if unidade_id is None:
+        return None, f'Unidade "{linha.get("unidade", "")}" não encontrada.'
+    
+    cpfs_cadastrados.add(campos['cpf'])
+    return dict(campos, unidade_id=unidade_id), None
+
+def inserir_lote_importado(modelo, lote):
+    ids = db.session.execute(db.insert(modelo).returning(modelo.id), lote).scalars().all()
+    registrar_alteracoes([(modelo.__tablename__, registro_id, 'upsert') for registro_id in ids])
+    return len(ids)
+
+def importar_csv(tipo, arquivo):
+    if tipo == 'unidades':
+        modelo = Unidade
+        numeros_cadastrados = {numero.casefold() for (numero,) in db.session.query(Unidade.numero)}
+        validar = lambda linha: validar_unidade_importada(linha, numeros_cadastrados)
+    else:
+        modelo = Morador
+        cpfs_cadastrados = {cpf for (cpf,) in db.session.query(Morador.cpf)}
+        unidades_por_numero = {numero.casefold(): unidade_id for numero, unidade_id in db.session.query(Unidade.numero, Unidade.id)}
+        validar = lambda linha: validar_morador_importado(linha, cpfs_cadastrados, unidades_por_numero)
+    
+    tamanho_lote = app.config['IMPORTACAO_TAMANHO_LOTE']
+    lote = []
+    importados = 0
+    erros = []
+    
+    for numero_linha, linha in ler_csv(arquivo):
+        valores, erro = validar(linha)
+        if erro:
+            erros.append((numero_linha, erro))
+            continue
+        lote.append(valores)
+        if len(lote) >= tamanho_lote:
+            importados += inserir_lote_importado(modelo, lote)
+            lote = []
+    
+    if lote:
+        importados += inserir_lote_importado(modelo, lote)
+    db.session.commit()
+    return importados, erros
+
+@app.route('/importar', methods=['GET', 'POST'])
+@admin_required
+def importar_dados():
+    resultado = None
+    if request.method == 'POST':
+        tipo = request.form.get('tipo')
+        arquivo = request.files.get('arquivo')
+        if tipo not in COLUNAS_IMPORTACAO:
+            flash('Tipo de importação inválido.', 'error')
+        elif not arquivo or not arquivo.filename:
+            flash('Selecione um arquivo CSV para importar.', 'error')
+        else:
+            try:
+                importados, erros = importar_csv(tipo, arquivo.stream)
+                resultado = {'tipo': tipo, 'importados': importados, 'erros': erros}
+                flash(f'{importados} registro(s) importado(s) com sucesso!', 'success')
+            except Exception as e:
+                db.session.rollback()
+                flash(f'Erro ao importar arquivo: {str(e)}', 'error')
+    
+    return render_template('importar.html', colunas=COLUNAS_IMPORTACAO, resultado=resultado)
+
 @app.route('/unidades')
 def listar_unidades():
-    unidades = Unidade.query.all()
+    unidades = com_perfil(Unidade.query, 'unidades').all()
     return render_template('unidades.html', unidades=unidades)
 
 @app.route('/moradores')
 def listar_moradores():
-    moradores = Morador.query.join(Unidade).all()
+    moradores = com_perfil(Morador.query.join(Morador.unidade), 'moradores').all()
     return render_template('moradores.html', moradores=moradores)
 
+TABELAS_VERSIONADAS = {'unidade', 'morador', 'usuario'}
+
+TABELAS_SINCRONIZADAS = {
+    'unidade': (Unidade, None, serializar_unidade),
+    'morador': (Morador, 'moradores_com_unidade', serializar_morador),
+    'visitante': (Visitante, 'visitantes', serializar_visitante),
+    'reserva': (Reserva, 'reservas', serializar_reserva),
+    'multa': (Multa, 'multas', serializar_multa)
+}
+
+ORDENACAO_ALTERACOES = [(RegistroAlteracao.id, False)]
+
+respostas_cache = {}
+respostas_cache_lock = threading.Lock()
+
+def incrementar_versoes_tabelas(tabelas):
+    agora = datetime.utcnow()
+    inserir_ignorando_conflito(VersaoTabela, [
+        {'tabela': tabela, 'versao': 0, 'atualizada_em': agora} for tabela in tabelas
+    ])
+    db.session.execute(
+        db.update(VersaoTabela)
+        .where(VersaoTabela.tabela.in_(tabelas))
+        .values(versao=VersaoTabela.versao + 1, atualizada_em=agora)
+    )
+
+def registrar_alteracoes(alteracoes):
+    tabelas = {tabela for tabela, _, _ in alteracoes}
+    incrementar_versoes_tabelas(sorted((tabelas & TABELAS_VERSIONADAS) | {'registro_alteracao'}))
+    agora = datetime.utcnow()
+    db.session.execute(db.insert(RegistroAlteracao), [
+        {'tabela': tabela, 'registro_id': registro_id, 'operacao': operacao, 'alterado_em': agora}
+        for tabela, registro_id, operacao in alteracoes
+    ])
+
+def registrar_estado_inicial_sincronizacao(conexao):
+    for tabela, (modelo, _, _) in TABELAS_SINCRONIZADAS.items():
+        conexao.execute(db.insert(RegistroAlteracao).from_select(
+            ['tabela', 'registro_id', 'operacao', 'alterado_em'],
+            db.select(
+                db.literal(tabela), modelo.id, db.literal('upsert'), db.func.current_timestamp()
+            ).order_by(modelo.id)
+        ))
+
+@event.listens_for(db.session, 'after_flush')
+def registrar_alteracoes_sessao(sessao, contexto):
+    alteracoes = [
+        (objeto.__tablename__, objeto.id, 'delete')
+        for objeto in sessao.deleted
+        if objeto.__tablename__ in TABELAS_SINCRONIZADAS
+    ] + [
+        (objeto.__tablename__, objeto.id, 'upsert')
+        for objeto in [*sessao.new, *sessao.dirty]
+        if objeto.__tablename__ in TABELAS_SINCRONIZADAS
+        and (objeto in sessao.new or sessao.is_modified(objeto, include_collections=False))
+    ]
+    if alteracoes:
+        registrar_alteracoes(alteracoes)
+
+@event.listens_for(db.session, 'after_flush')
+def contar_visitantes_sessao(sessao, contexto):
+    variacoes = {}
+    for objetos, delta in ((sessao.new, 1), (sessao.deleted, -1)):
+        for objeto in objetos:
+            if isinstance(objeto, Visitante):
+                for unidade_id in (0, objeto.unidade_id):
+                    variacoes[unidade_id] = variacoes.get(unidade_id, 0) + delta
+    if not variacoes:
+        return
+    inserir_ignorando_conflito(ContagemVisitantes, [{'unidade_id': unidade_id, 'total': 0} for unidade_id in variacoes])
+    tabela = ContagemVisitantes.__table__
+    db.session.execute(
+        tabela.update().where(tabela.c.unidade_id == db.bindparam('chave_unidade'))
+        .values(total=tabela.c.total + db.bindparam('delta')),
+        [{'chave_unidade': unidade_id, 'delta': delta} for unidade_id, delta in sorted(variacoes.items())]
+    )
+
+@event.listens_for(db.session, 'do_orm_execute')
+def registrar_versoes_em_lote(estado):
+    if not (estado.is_insert or estado.is_update or estado.is_delete) or estado.bind_mapper is None:
+        return
+    tabela = estado.bind_mapper.persist_selectable.name
+    if tabela in TABELAS_VERSIONADAS:
+        incrementar_versoes_tabelas([tabela])
+
+def resposta_versionada(nome, tabelas, gerar):
+    versoes = {tabela: (0, None) for tabela in tabelas}
+    versoes.update({
+        tabela: (versao, atualizada_em)
+        for tabela, versao, atualizada_em in db.session.query(
+            VersaoTabela.tabela, VersaoTabela.versao, VersaoTabela.atualizada_em
+        ).filter(VersaoTabela.tabela.in_(tabelas))
+    })
+    chave = tuple(versoes[tabela][0] for tabela in tabelas)
+    
+    entrada = respostas_cache.get(nome)
+    if not entrada or entrada[0] != chave:
+        entrada = (chave, app.json.dumps(gerar()))
+        with respostas_cache_lock:
+            respostas_cache[nome] = entrada
+    
+    resposta = Response(entrada[1], mimetype='application/json')
+    resposta.set_etag(f"{nome}-{'-'.join(map(str, chave))}")
+    datas = [atualizada_em for _, atualizada_em in versoes.values() if atualizada_em]
+    if datas:
+        resposta.last_modified = max(datas)
+    resposta.cache_control.no_cache = True
+    return resposta.make_conditional(request)
+
 @app.route('/api/unidades')
 def api_unidades():
-    unidades = Unidade.query.all()
-    return jsonify([{
-        'id': u.id,
-        'numero': u.numero,
-        'bloco': u.bloco,
-        'tipo': u.tipo,
-        'vagas_garagem': u.vagas_garagem
-    } for u in unidades])
+    return resposta_versionada('unidades', ['unidade'], lambda: [
+        serializar_unidade(u) for u in Unidade.query.all()
+    ])
 
 @app.route('/api/moradores')
 def api_moradores():
-    moradores = Morador.query.join(Unidade).all()
-    return jsonify([{
-        'id': m.id,
-        'nome': m.nome,
-        'cpf': m.cpf,
-        'telefone': m.telefone,
-        'email': m.email,
-        'tipo': m.tipo,
-        'unidade': f"{m.unidade.bloco} - {m.unidade.numero}"
-    } for m in moradores])
+    return resposta_versionada('moradores', ['morador', 'unidade'], lambda: [
+        serializar_morador(m) for m in com_perfil(Morador.query.join(Morador.unidade), 'moradores')
+    ])
+
+@app.route('/api/sincronizacao')
+@admin_required
+def api_sincronizacao():
+    cursor = request.args.get('desde')
+    ultimo_id = decodificar_cursor(cursor, ORDENACAO_ALTERACOES)[0] if cursor else 0
+    tamanho = tamanho_pagina()
+    
+    registros = db.session.query(
+        RegistroAlteracao.id, RegistroAlteracao.tabela, RegistroAlteracao.registro_id, RegistroAlteracao.operacao
+    ).filter(
+        RegistroAlteracao.id > ultimo_id
+    ).order_by(RegistroAlteracao.id).limit(tamanho).all()
+    
+    operacoes = {}
+    for registro in registros:
+        operacoes.pop((registro.tabela, registro.registro_id), None)
+        operacoes[(registro.tabela, registro.registro_id)] = registro.operacao
+    
+    existentes = {}
+    for tabela, (modelo, perfil, _) in TABELAS_SINCRONIZADAS.items():
+        ids = [registro_id for (t, registro_id), operacao in operacoes.items() if t == tabela and operacao == 'upsert']
+        if ids:
+            consulta = com_perfil(modelo.query, perfil) if perfil else modelo.query
+            existentes.update({(tabela, item.id): item for item in consulta.filter(modelo.id.in_(ids))})
+    
+    alteracoes = []
+    for (tabela, registro_id), operacao in operacoes.items():
+        item = existentes.get((tabela, registro_id))
+        alteracoes.append({
+            'tabela': tabela,
+            'id': registro_id,
+            'operacao': 'upsert' if item else 'delete',
+            'dados': TABELAS_SINCRONIZADAS[tabela][2](item) if item else None
+        })
+    
+    return jsonify({
+        'alteracoes': alteracoes,
+        'proximo_cursor': codificar_cursor([registros[-1].id if registros else ultimo_id]),
+        'completo': len(registros) < tamanho
+    })
 
 @app.route('/deletar_unidade/<int:unidade_id>', methods=['POST'])
 def deletar_unidade(unidade_id):
@@ -360,22 +1642,455 @@ def deletar_unidade(unidade_id):
     
     return redirect(url_for('listar_unidades'))
 
-@app.route('/deletar_morador/<int:morador_id>', methods=['POST'])
-def deletar_morador(morador_id):
-    try:
-        morador = Morador.query.get_or_404(morador_id)
-        db.session.delete(morador)
-        db.session.commit()
-        flash('Morador removido com sucesso!', 'success')
-    except Exception as e:
-        flash(f'Erro ao remover morador: {str(e)}', 'error')
-    
-    return redirect(url_for('listar_moradores'))
+@app.route('/deletar_morador/<int:morador_id>', methods=['POST'])
+def deletar_morador(morador_id):
+    try:
+        morador = Morador.query.get_or_404(morador_id)
+        db.session.delete(morador)
+        db.session.commit()
+        flash('Morador removido com sucesso!', 'success')
+    except Exception as e:
+        flash(f'Erro ao remover morador: {str(e)}', 'error')
+    
+    return redirect(url_for('listar_moradores'))
+
+def normalizar_busca(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower().strip()
+
+def apenas_digitos(texto):
+    return ''.join(c for c in texto or '' if c.isdigit())
+
+def trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+class IndiceBusca:
+    def __init__(self):
+        self.documentos = {}
+        self.trigramas = {}
+        self.termos = []
+        self.ultimo_registro_id = None
+        self.lock = threading.RLock()
+    
+    def limpar(self):
+        self.documentos.clear()
+        self.trigramas.clear()
+        self.termos.clear()
+        self.ultimo_registro_id = None
+    
+    def documento(self, termos, dados):
+        termos = sorted({normalizar_busca(termo) for termo in termos} - {''})
+        return termos, '\0' + '\0'.join(termos) + '\0', dados
+    
+    def adicionar(self, chave, termos, dados):
+        self.remover(chave)
+        self.documentos[chave] = self.documento(termos, dados)
+        for termo in self.documentos[chave][0]:
+            for trigrama in trigramas(termo):
+                self.trigramas.setdefault(trigrama, set()).add(chave)
+            bisect.insort(self.termos, (termo, chave))
+    
+    def carregar(self, documentos):
+        for chave, termos, dados in documentos:
+            self.documentos[chave] = self.documento(termos, dados)
+        for chave, (termos, _, _) in self.documentos.items():
+            for termo in termos:
+                for trigrama in trigramas(termo):
+                    self.trigramas.setdefault(trigrama, set()).add(chave)
+                self.termos.append((termo, chave))
+        self.termos.sort()
+    
+    def remover(self, chave):
+        documento = self.documentos.pop(chave, None)
+        if not documento:
+            return
+        for termo in documento[0]:
+            for trigrama in trigramas(termo):
+                chaves = self.trigramas.get(trigrama)
+                if chaves is not None:
+                    chaves.discard(chave)
+                    if not chaves:
+                        del self.trigramas[trigrama]
+            posicao = bisect.bisect_left(self.termos, (termo, chave))
+            if posicao < len(self.termos) and self.termos[posicao] == (termo, chave):
+                del self.termos[posicao]
+    
+    def buscar(self, consulta, limite):
+        consulta = normalizar_busca(consulta)
+        if any(c in '.-/' for c in consulta) and all(c.isdigit() or c in '.-/' for c in consulta):
+            consulta = apenas_digitos(consulta) or consulta
+        if not consulta:
+            return []
+        
+        if len(consulta) < 3:
+            candidatos = set()
+            posicao = bisect.bisect_left(self.termos, (consulta,))
+            while posicao < len(self.termos) and self.termos[posicao][0].startswith(consulta):
+                candidatos.add(self.termos[posicao][1])
+                if len(candidatos) >= limite * 10:
+                    break
+                posicao += 1
+        else:
+            conjuntos = sorted((self.trigramas.get(t, set()) for t in trigramas(consulta)), key=len)
+            candidatos = set.intersection(*conjuntos) if conjuntos[0] else set()
+        
+        exato = '\0' + consulta + '\0'
+        prefixo = '\0' + consulta
+        resultados = []
+        for chave in candidatos:
+            _, texto, dados = self.documentos[chave]
+            if exato in texto:
+                pontuacao = 0
+            elif prefixo in texto:
+                pontuacao = 1
+            elif consulta in texto:
+                pontuacao = 2
+            else:
+                continue
+            resultados.append((pontuacao, ORDEM_SUGESTOES[chave[0]], dados['rotulo'], chave))
+        return [self.documentos[chave][2] for *_, chave in heapq.nsmallest(limite, resultados)]
+
+ORDEM_SUGESTOES = {'unidade': 0, 'morador': 1, 'visitante': 2}
+
+indice_checkin = IndiceBusca()
+
+TABELAS_CHECKIN = ('unidade', 'morador', 'visitante')
+
+def documento_unidade(unidade):
+    return ('unidade', unidade.id), [unidade.numero, unidade.bloco, f'{unidade.bloco} {unidade.numero}'], {
+        'tipo': 'unidade',
+        'unidade_id': unidade.id,
+        'rotulo': f'{unidade.bloco} - {unidade.numero}'
+    }
+
+def documento_morador(morador, unidade):
+    return ('morador', morador.id), [morador.nome, *morador.nome.split()], {
+        'tipo': 'morador',
+        'morador_id': morador.id,
+        'unidade_id': unidade.id,
+        'rotulo': f'{morador.nome} ({unidade.bloco} - {unidade.numero})'
+    }
+
+def documento_visitante(visitante):
+    cpf = apenas_digitos(visitante.cpf) or visitante.cpf
+    return ('visitante', cpf), [visitante.nome, *visitante.nome.split(), visitante.cpf, cpf], {
+        'tipo': 'visitante',
+        'cpf': visitante.cpf,
+        'nome': visitante.nome,
+        'telefone': visitante.telefone,
+        'unidade_id': visitante.unidade_id,
+        'rotulo': f'{visitante.nome} — {visitante.cpf}'
+    }
+
+def colunas_visitante_indexado():
+    return db.session.query(
+        Visitante.id, Visitante.nome, Visitante.cpf, Visitante.telefone, Visitante.unidade_id
+    )
+
+def reindexar_visitantes_por_cpf(indice, cpf):
+    ultimo = colunas_visitante_indexado().filter(Visitante.cpf == cpf).order_by(
+        Visitante.data_entrada.desc(), Visitante.id.desc()
+    ).first()
+    if ultimo:
+        indice.adicionar(*documento_visitante(ultimo))
+    else:
+        indice.remover(('visitante', apenas_digitos(cpf) or cpf))
+
+def documentos_checkin():
+    unidades = {unidade.id: unidade for unidade in db.session.query(Unidade.id, Unidade.numero, Unidade.bloco)}
+    for unidade in unidades.values():
+        yield documento_unidade(unidade)
+    for morador in db.session.query(Morador.id, Morador.nome, Morador.unidade_id):
+        if morador.unidade_id in unidades:
+            yield documento_morador(morador, unidades[morador.unidade_id])
+    ordem = db.func.row_number().over(
+        partition_by=Visitante.cpf, order_by=(Visitante.data_entrada.desc(), Visitante.id.desc())
+    ).label('ordem')
+    ultimas = colunas_visitante_indexado().add_columns(Visitante.data_entrada, ordem).subquery()
+    for visitante in db.session.query(
+        ultimas.c.id, ultimas.c.nome, ultimas.c.cpf, ultimas.c.telefone, ultimas.c.unidade_id
+    ).filter(ultimas.c.ordem == 1).order_by(ultimas.c.data_entrada, ultimas.c.id).yield_per(1000):
+        yield documento_visitante(visitante)
+
+def reconstruir_indice_checkin():
+    global indice_checkin
+    novo = IndiceBusca()
+    novo.ultimo_registro_id = db.session.query(db.func.max(RegistroAlteracao.id)).scalar() or 0
+    novo.carregar(documentos_checkin())
+    db.session.rollback()
+    indice_checkin = novo
+    return novo
+
+reconstrucao_checkin = None
+reconstrucao_checkin_lock = threading.Lock()
+
+def executar_reconstrucao_checkin():
+    with app.app_context():
+        reconstruir_indice_checkin()
+
+def agendar_reconstrucao_checkin():
+    global reconstrucao_checkin
+    with reconstrucao_checkin_lock:
+        if reconstrucao_checkin and reconstrucao_checkin.is_alive():
+            return
+        reconstrucao_checkin = threading.Thread(target=executar_reconstrucao_checkin, name='indice_checkin', daemon=True)
+        reconstrucao_checkin.start()
+
+def aplicar_alteracao_checkin(indice, tabela, registro_id):
+    if tabela == 'unidade':
+        unidade = db.session.query(Unidade.id, Unidade.numero, Unidade.bloco).filter(Unidade.id == registro_id).first()
+        if not unidade:
+            indice.remover(('unidade', registro_id))
+            return
+        indice.adicionar(*documento_unidade(unidade))
+        for morador in db.session.query(Morador.id, Morador.nome).filter(Morador.unidade_id == unidade.id):
+            indice.adicionar(*documento_morador(morador, unidade))
+    elif tabela == 'morador':
+        morador = db.session.query(Morador.id, Morador.nome, Morador.unidade_id).filter(Morador.id == registro_id).first()
+        unidade = morador and db.session.query(Unidade.id, Unidade.numero, Unidade.bloco).filter(
+            Unidade.id == morador.unidade_id
+        ).first()
+        if not unidade:
+            indice.remover(('morador', registro_id))
+            return
+        indice.adicionar(*documento_morador(morador, unidade))
+    elif tabela == 'visitante':
+        cpf = db.session.query(Visitante.cpf).filter(Visitante.id == registro_id).scalar()
+        if cpf:
+            reindexar_visitantes_por_cpf(indice, cpf)
+
+def atualizar_indice_checkin():
+    indice = indice_checkin
+    if indice.ultimo_registro_id is None:
+        agendar_reconstrucao_checkin()
+        return indice
+    with indice.lock:
+        limite = app.config['CHECKIN_ALTERACOES_MAX']
+        registros = db.session.query(
+            RegistroAlteracao.id, RegistroAlteracao.tabela, RegistroAlteracao.registro_id
+        ).filter(
+            RegistroAlteracao.id > indice.ultimo_registro_id
+        ).order_by(RegistroAlteracao.id).limit(limite + 1).all()
+        relevantes = [r for r in registros if r.tabela in TABELAS_CHECKIN]
+        if len(relevantes) > limite:
+            agendar_reconstrucao_checkin()
+            return indice
+        for tabela, registro_id in dict.fromkeys((r.tabela, r.registro_id) for r in relevantes):
+            aplicar_alteracao_checkin(indice, tabela, registro_id)
+        if registros:
+            indice.ultimo_registro_id = registros[-1].id
+    return indice
+
+def buscar_sugestoes_checkin(consulta):
+    indice = atualizar_indice_checkin()
+    with indice.lock:
+        return indice.buscar(consulta, app.config['CHECKIN_SUGESTOES_MAX'])
+
+MARCA_INICIO = '\x02'
+MARCA_FIM = '\x03'
+
+def consulta_moradores_busca(usuario):
+    consulta = Morador.query
+    if usuario.tipo != 'Admin':
+        consulta = consulta.filter(Morador.unidade_id == usuario.morador.unidade_id)
+    return consulta
+
+def consulta_mensagens_busca(usuario):
+    return ChatMensagem.query.filter(
+        or_(ChatMensagem.remetente_id == usuario.id, ChatMensagem.destinatario_id == usuario.id)
+    )
+
+def contato_mensagem(usuario):
+    return db.case((ChatMensagem.remetente_id == usuario.id, ChatMensagem.destinatario_id), else_=ChatMensagem.remetente_id)
+
+FONTES_BUSCA = {
+    'morador': {
+        'modelo': Morador,
+        'colunas': ['nome', 'cpf', 'email', 'telefone'],
+        'consulta': consulta_moradores_busca,
+        'titulo': lambda usuario: Morador.nome,
+        'referencia': lambda usuario: Morador.unidade_id
+    },
+    'visitante': {
+        'modelo': Visitante,
+        'colunas': ['nome', 'cpf', 'observacoes'],
+        'consulta': consulta_visitantes,
+        'titulo': lambda usuario: Visitante.nome,
+        'referencia': lambda usuario: Visitante.unidade_id
+    },
+    'notificacao': {
+        'modelo': Notificacao,
+        'colunas': ['titulo', 'mensagem'],
+        'consulta': consulta_notificacoes,
+        'titulo': lambda usuario: Notificacao.titulo,
+        'referencia': lambda usuario: Notificacao.morador_id
+    },
+    'chat_mensagem': {
+        'modelo': ChatMensagem,
+        'colunas': ['mensagem'],
+        'consulta': consulta_mensagens_busca,
+        'titulo': lambda usuario: db.select(Usuario.username).where(Usuario.id == contato_mensagem(usuario)).scalar_subquery(),
+        'referencia': contato_mensagem
+    }
+}
+
+def gatilho_atualizacao_busca(tabela, fonte):
+    fts = f'{tabela}_fts'
+    colunas = ', '.join(fonte['colunas'])
+    novos = ', '.join(f'new.{coluna}' for coluna in fonte['colunas'])
+    antigos = ', '.join(f'old.{coluna}' for coluna in fonte['colunas'])
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {colunas} ON {tabela} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {colunas}) VALUES ('delete', old.id, {antigos}); "
+        f"INSERT INTO {fts}(rowid, {colunas}) VALUES (new.id, {novos}); END"
+    )
+
+def recriar_gatilhos_atualizacao_busca(conexao):
+    if conexao.dialect.name != 'sqlite':
+        return
+    for tabela, fonte in FONTES_BUSCA.items():
+        conexao.exec_driver_sql(f'DROP TRIGGER IF EXISTS {tabela}_fts_au')
+        conexao.exec_driver_sql(gatilho_atualizacao_busca(tabela, fonte))
+
+def criar_indices_busca(conexao):
+    if conexao.dialect.name != 'sqlite':
+        return
+    for tabela, fonte in FONTES_BUSCA.items():
+        fts = f'{tabela}_fts'
+        colunas = ', '.join(fonte['colunas'])
+        novos = ', '.join(f'new.{coluna}' for coluna in fonte['colunas'])
+        antigos = ', '.join(f'old.{coluna}' for coluna in fonte['colunas'])
+        for comando in (
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({colunas}, content='{tabela}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabela} BEGIN "
+            f"INSERT INTO {fts}(rowid, {colunas}) VALUES (new.id, {novos}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabela} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {colunas}) VALUES ('delete', old.id, {antigos}); END",
+            gatilho_atualizacao_busca(tabela, fonte),
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"
+        ):
+            conexao.exec_driver_sql(comando)
+
+def palavras_busca(texto):
+    return ''.join(c if c.isalnum() else ' ' for c in texto or '').split()[:10]
+
+def consulta_fonte_busca(tipo, usuario, palavras):
+    fonte = FONTES_BUSCA[tipo]
+    modelo = fonte['modelo']
+    consulta = fonte['consulta'](usuario)
+    
+    if db.engine.dialect.name == 'sqlite':
+        nome_fts = f'{tipo}_fts'
+        fts = db.table(nome_fts, db.column('rowid', db.Integer), db.column('rank', db.Float), db.column(nome_fts))
+        consulta = consulta.join(fts, fts.c.rowid == modelo.id).filter(
+            fts.c[nome_fts].op('MATCH')(' '.join(f'"{palavra}"*' for palavra in palavras))
+        )
+        rank = fts.c.rank
+        trecho = db.func.snippet(db.literal_column(nome_fts), -1, MARCA_INICIO, MARCA_FIM, '…', 12)
+    else:
+        consulta = consulta.filter(and_(*[
+            or_(*[getattr(modelo, coluna).ilike(f'%{palavra}%') for coluna in fonte['colunas']])
+            for palavra in palavras
+        ]))
+        rank = db.literal(0.0, db.Float)
+        trecho = getattr(modelo, fonte['colunas'][-1])
+    
+    return consulta.with_entities(
+        db.literal(tipo, db.String).label('tipo'),
+        modelo.id.label('id'),
+        rank.label('rank'),
+        fonte['titulo'](usuario).label('titulo'),
+        trecho.label('trecho'),
+        fonte['referencia'](usuario).label('referencia')
+    )
+
+def buscar_texto(usuario, texto, tipos=None, cursor=None):
+    palavras = palavras_busca(texto)
+    tipos = [tipo for tipo in FONTES_BUSCA if not tipos or tipo in tipos]
+    if not palavras or not tipos:
+        return [], None
+    
+    uniao = db.union_all(*[consulta_fonte_busca(tipo, usuario, palavras).statement for tipo in tipos]).subquery()
+    ordenacao = [(uniao.c.rank, False), (uniao.c.tipo, False), (uniao.c.id, False)]
+    return paginar(db.session.query(uniao), ordenacao, cursor)
+
+def url_resultado_busca(resultado):
+    if resultado.tipo == 'morador':
+        return url_for('listar_moradores')
+    if resultado.tipo == 'visitante':
+        return url_for('listar_visitantes')
+    if resultado.tipo == 'notificacao':
+        return url_for('listar_notificacoes')
+    return url_for('chat_conversa', destinatario_id=resultado.referencia)
+
+def serializar_resultado_busca(resultado):
+    return {
+        'tipo': resultado.tipo,
+        'id': resultado.id,
+        'titulo': resultado.titulo,
+        'trecho': str(
+            escape(resultado.trecho or '').replace(MARCA_INICIO, Markup('<mark>')).replace(MARCA_FIM, Markup('</mark>'))
+        ),
+        'url': url_resultado_busca(resultado)
+    }
+
+@app.route('/busca')
+@login_required
+def busca():
+    usuario = usuario_atual()
+    texto = request.args.get('q', '').strip()
+    tipo = request.args.get('tipo')
+    resultados, proximo_cursor = buscar_texto(usuario, texto, [tipo] if tipo else None, request.args.get('cursor'))
+    return render_template(
+        'busca.html',
+        texto=texto,
+        tipo=tipo,
+        tipos=FONTES_BUSCA,
+        resultados=[serializar_resultado_busca(resultado) for resultado in resultados],
+        proximo_cursor=proximo_cursor
+    )
+
+@app.route('/api/busca')
+@login_required
+def api_busca():
+    usuario = usuario_atual()
+    tipos = request.args.getlist('tipo') or None
+    resultados, proximo_cursor = buscar_texto(usuario, request.args.get('q', ''), tipos, request.args.get('cursor'))
+    return resposta_paginada(resultados, proximo_cursor, serializar_resultado_busca)
+
+@app.route('/api/checkin/sugestoes')
+@admin_required
+def api_sugestoes_checkin():
+    return jsonify({'sugestoes': buscar_sugestoes_checkin(request.args.get('q', ''))})
+
+@app.route('/api/checkin', methods=['POST'])
+@admin_required
+def api_checkin():
+    dados = request.get_json(silent=True) or {}
+    campos = {campo: str(dados.get(campo) or '').strip() for campo in ('nome', 'cpf', 'telefone', 'observacoes')}
+    faltando = [campo for campo in ('nome', 'cpf', 'telefone') if not campos[campo]]
+    if faltando:
+        return jsonify({'erro': f"Campos obrigatórios: {', '.join(faltando)}."}), 400
+    
+    unidade_id = dados.get('unidade_id')
+    if not isinstance(unidade_id, int) or not db.session.get(Unidade, unidade_id):
+        return jsonify({'erro': 'Unidade inválida.'}), 400
+    
+    visitante = Visitante(
+        nome=campos['nome'],
+        cpf=campos['cpf'],
+        telefone=campos['telefone'],
+        unidade_id=unidade_id,
+        observacoes=campos['observacoes']
+    )
+    db.session.add(visitante)
+    db.session.commit()
+    return jsonify(serializar_visitante(visitante)), 201
 
 @app.route('/cadastrar_visitante', methods=['GET', 'POST'])
 @login_required
 def cadastrar_visitante():
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = usuario_atual()
     
     if request.method == 'POST':
         try:
@@ -409,27 +2124,26 @@ def cadastrar_visitante():
 @app.route('/visitantes')
 @login_required
 def listar_visitantes():
-    usuario = Usuario.query.get(session['user_id'])
-    
-    if usuario.tipo == 'Admin':
-        visitantes = Visitante.query.order_by(Visitante.data_entrada.desc()).all()
-    else:
-        visitantes = Visitante.query.filter_by(unidade_id=usuario.morador.unidade_id).order_by(Visitante.data_entrada.desc()).all()
+    usuario = usuario_atual()
     
-    total_visitantes = len(visitantes)
-    visitantes_ativos = len([v for v in visitantes if v.data_saida is None])
-    visitantes_finalizados = len([v for v in visitantes if v.data_saida is not None])
-    
-    from datetime import datetime, date
-    hoje = date.today()
-    visitantes_hoje = len([v for v in visitantes if v.data_entrada.date() == hoje])
+    consulta = consulta_visitantes(usuario)
+    visitantes, proximo_cursor = paginar(
+        com_perfil(consulta, 'visitantes'), ORDENACAO_VISITANTES, request.args.get('cursor')
+    )
     
     return render_template('visitantes.html', 
                          visitantes=visitantes,
-                         total_visitantes=total_visitantes,
-                         visitantes_ativos=visitantes_ativos,
-                         visitantes_finalizados=visitantes_finalizados,
-                         visitantes_hoje=visitantes_hoje)
+                         proximo_cursor=proximo_cursor,
+                         **calcular_estatisticas_visitantes(usuario))
+
+@app.route('/api/visitantes')
+@login_required
+def api_visitantes():
+    usuario = usuario_atual()
+    visitantes, proximo_cursor = paginar(
+        com_perfil(consulta_visitantes(usuario), 'visitantes'), ORDENACAO_VISITANTES, request.args.get('cursor')
+    )
+    return resposta_paginada(visitantes, proximo_cursor, serializar_visitante)
 
 @app.route('/registrar_saida/<int:visitante_id>', methods=['POST'])
 @login_required
@@ -444,52 +2158,198 @@ def registrar_saida(visitante_id):
     
     return redirect(url_for('listar_visitantes'))
 
+STATUS_MULTA_ABERTOS = ('Pendente', 'Vencida')
+CAMPOS_SALDO_MULTAS = (
+    'multas_abertas', 'aberto_centavos', 'multas_vencidas', 'vencido_centavos', 'multas_pagas', 'pago_centavos'
+)
+CAMPOS_STATUS_MULTA = {
+    'Pendente': [('multas_abertas', 'aberto_centavos')],
+    'Vencida': [('multas_abertas', 'aberto_centavos'), ('multas_vencidas', 'vencido_centavos')],
+    'Pago': [('multas_pagas', 'pago_centavos')]
+}
+ORDENACAO_INADIMPLENCIA = [(SaldoMultas.vencido_centavos, True), (SaldoMultas.referencia_id, True)]
+
+def converter_centavos(texto):
+    try:
+        valor = Decimal(texto.strip().replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError('valor inválido')
+    if not valor.is_finite() or valor <= 0 or valor != valor.quantize(Decimal('0.01')):
+        raise ValueError('valor inválido')
+    return int(valor.scaleb(2))
+
+def saldo_multas(escopo, referencia_id):
+    saldo = db.session.get(SaldoMultas, (escopo, referencia_id))
+    if saldo is None:
+        saldo = SaldoMultas(escopo=escopo, referencia_id=referencia_id, **dict.fromkeys(CAMPOS_SALDO_MULTAS, 0))
+    return saldo
+
+def saldo_multas_usuario(usuario):
+    if usuario.tipo == 'Admin':
+        return saldo_multas('condominio', 0)
+    return saldo_multas('morador', usuario.morador_id)
+
+def travar_saldos_multas():
+    inserir_ignorando_conflito(SaldoMultas, [{
+        'escopo': 'condominio', 'referencia_id': 0, **dict.fromkeys(CAMPOS_SALDO_MULTAS, 0)
+    }])
+    db.session.execute(
+        db.update(SaldoMultas.__table__)
+        .where(SaldoMultas.escopo == 'condominio', SaldoMultas.referencia_id == 0)
+        .values(atualizado_em=datetime.utcnow())
+    )
+
+def movimentar_saldos_multas(movimentos):
+    saldos = {}
+    for morador_id, unidade_id, status, quantidade, centavos in movimentos:
+        for chave in (('condominio', 0), ('unidade', unidade_id), ('morador', morador_id)):
+            saldo = saldos.setdefault(chave, dict.fromkeys(CAMPOS_SALDO_MULTAS, 0))
+            for campo_quantidade, campo_valor in CAMPOS_STATUS_MULTA[status]:
+                saldo[campo_quantidade] += quantidade
+                saldo[campo_valor] += centavos
+    if not saldos:
+        return
+    agora = datetime.utcnow()
+    inserir_ignorando_conflito(SaldoMultas, [
+        {'escopo': escopo, 'referencia_id': referencia_id, **dict.fromkeys(CAMPOS_SALDO_MULTAS, 0)}
+        for escopo, referencia_id in saldos
+    ])
+    tabela = SaldoMultas.__table__
+    db.session.execute(
+        tabela.update()
+        .where(tabela.c.escopo == db.bindparam('chave_escopo'), tabela.c.referencia_id == db.bindparam('chave_referencia'))
+        .values(atualizado_em=agora, **{campo: tabela.c[campo] + db.bindparam(f'delta_{campo}') for campo in CAMPOS_SALDO_MULTAS}),
+        [
+            {'chave_escopo': escopo, 'chave_referencia': referencia_id, **{f'delta_{campo}': valor for campo, valor in saldo.items()}}
+            for (escopo, referencia_id), saldo in sorted(saldos.items())
+        ]
+    )
+
+def registrar_alteracoes_selecionadas(modelo, *filtros):
+    incrementar_versoes_tabelas(['registro_alteracao'])
+    db.session.execute(db.insert(RegistroAlteracao).from_select(
+        ['tabela', 'registro_id', 'operacao', 'alterado_em'],
+        db.select(
+            db.literal(modelo.__tablename__), modelo.id, db.literal('upsert'), db.literal(datetime.utcnow())
+        ).where(*filtros).order_by(modelo.id)
+    ))
+
+def vencer_multas(hoje=None):
+    hoje = hoje or date.today()
+    filtros = [Multa.status == 'Pendente', Multa.data_vencimento < hoje]
+    travar_saldos_multas()
+    grupos = db.session.execute(
+        db.select(Multa.morador_id, Morador.unidade_id, db.func.count(Multa.id), db.func.sum(Multa.valor_centavos))
+        .join(Morador, Morador.id == Multa.morador_id)
+        .where(*filtros)
+        .group_by(Multa.morador_id, Morador.unidade_id)
+    ).all()
+    if not grupos:
+        return []
+    movimentar_saldos_multas([
+        (morador_id, unidade_id, status, sinal * quantidade, sinal * centavos)
+        for morador_id, unidade_id, quantidade, centavos in grupos
+        for status, sinal in (('Pendente', -1), ('Vencida', 1))
+    ])
+    registrar_alteracoes_selecionadas(Multa, *filtros)
+    db.session.execute(
+        db.update(Multa).where(*filtros).values(status='Vencida').execution_options(synchronize_session=False)
+    )
+    return grupos
+
 @app.route('/cadastrar_multa', methods=['GET', 'POST'])
 @admin_required
 def cadastrar_multa():
     if request.method == 'POST':
         try:
-            from datetime import datetime
             data_vencimento = datetime.strptime(request.form['data_vencimento'], '%Y-%m-%d').date()
+            morador = db.session.get(Morador, int(request.form['morador_id']))
+            if morador is None:
+                raise ValueError('morador não encontrado')
             
             multa = Multa(
-                morador_id=int(request.form['morador_id']),
-                valor=float(request.form['valor']),
+                morador_id=morador.id,
+                valor_centavos=converter_centavos(request.form['valor']),
                 descricao=request.form['descricao'],
-                data_vencimento=data_vencimento
+                data_vencimento=data_vencimento,
+                status='Vencida' if data_vencimento < date.today() else 'Pendente'
             )
             db.session.add(multa)
+            travar_saldos_multas()
+            movimentar_saldos_multas([(morador.id, morador.unidade_id, multa.status, 1, multa.valor_centavos)])
             db.session.commit()
             flash('Multa cadastrada com sucesso!', 'success')
             return redirect(url_for('listar_multas'))
         except Exception as e:
+            db.session.rollback()
             flash(f'Erro ao cadastrar multa: {str(e)}', 'error')
     
-    moradores = Morador.query.all()
+    moradores = com_perfil(Morador.query, 'moradores_com_unidade').order_by(Morador.nome).all()
     return render_template('cadastrar_multa.html', moradores=moradores)
 
 @app.route('/multas')
 @login_required
 def listar_multas():
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = usuario_atual()
     
-    if usuario.tipo == 'Admin':
-        multas = Multa.query.order_by(Multa.data_vencimento.desc()).all()
-    else:
-        multas = Multa.query.filter_by(morador_id=usuario.morador_id).order_by(Multa.data_vencimento.desc()).all()
+    consulta = consulta_multas(usuario)
+    multas, proximo_cursor = paginar(
+        com_perfil(consulta, 'multas'), ORDENACAO_MULTAS, request.args.get('cursor')
+    )
     
-    return render_template('multas.html', multas=multas)
+    saldo = saldo_multas_usuario(usuario)
+    
+    return render_template('multas.html',
+                         multas=multas,
+                         proximo_cursor=proximo_cursor,
+                         total_multas=saldo.multas_abertas + saldo.multas_pagas,
+                         multas_pendentes=saldo.multas_abertas,
+                         multas_vencidas=saldo.multas_vencidas,
+                         multas_pagas=saldo.multas_pagas,
+                         valor_total=Decimal(saldo.aberto_centavos + saldo.pago_centavos).scaleb(-2))
 
-@app.route('/pagar_multa/<int:multa_id>', methods=['POST'])
+@app.route('/multas/inadimplencia')
+@admin_required
+def relatorio_inadimplencia():
+    consulta = SaldoMultas.query.filter(SaldoMultas.escopo == 'unidade', SaldoMultas.vencido_centavos > 0)
+    saldos, proximo_cursor = paginar(
+        com_perfil(consulta, 'inadimplencia'), ORDENACAO_INADIMPLENCIA, request.args.get('cursor')
+    )
+    return render_template('inadimplencia.html',
+                         saldos=saldos,
+                         proximo_cursor=proximo_cursor,
+                         condominio=saldo_multas('condominio', 0))
+
+@app.route('/api/multas')
 @login_required
+def api_multas():
+    usuario = usuario_atual()
+    multas, proximo_cursor = paginar(
+        com_perfil(consulta_multas(usuario), 'multas'), ORDENACAO_MULTAS, request.args.get('cursor')
+    )
+    return resposta_paginada(multas, proximo_cursor, serializar_multa)
+
+@app.route('/pagar_multa/<int:multa_id>', methods=['POST'])
+@admin_required
 def pagar_multa(multa_id):
     try:
-        multa = Multa.query.get_or_404(multa_id)
+        travar_saldos_multas()
+        multa = Multa.query.populate_existing().get_or_404(multa_id)
+        if multa.status not in STATUS_MULTA_ABERTOS:
+            db.session.rollback()
+            flash('Esta multa já foi paga.', 'error')
+            return redirect(url_for('listar_multas'))
+        unidade_id = db.session.query(Morador.unidade_id).filter(Morador.id == multa.morador_id).scalar()
+        movimentar_saldos_multas([
+            (multa.morador_id, unidade_id, multa.status, -1, -multa.valor_centavos),
+            (multa.morador_id, unidade_id, 'Pago', 1, multa.valor_centavos)
+        ])
         multa.status = 'Pago'
         multa.data_pagamento = datetime.utcnow().date()
         db.session.commit()
         flash('Multa paga com sucesso!', 'success')
     except Exception as e:
+        db.session.rollback()
         flash(f'Erro ao pagar multa: {str(e)}', 'error')
     
     return redirect(url_for('listar_multas'))
@@ -497,19 +2357,117 @@ def pagar_multa(multa_id):
 @app.route('/reservas')
 @login_required
 def listar_reservas():
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = usuario_atual()
     
-    if usuario.tipo == 'Admin':
-        reservas = Reserva.query.order_by(Reserva.data.desc(), Reserva.horario_inicio).all()
-    else:
-        reservas = Reserva.query.filter_by(morador_id=usuario.morador_id).order_by(Reserva.data.desc(), Reserva.horario_inicio).all()
+    reservas, proximo_cursor = paginar(
+        com_perfil(consulta_reservas(usuario), 'reservas'), ORDENACAO_RESERVAS, request.args.get('cursor')
+    )
     
-    return render_template('reservas.html', reservas=reservas, usuario=usuario)
+    return render_template('reservas.html', reservas=reservas, proximo_cursor=proximo_cursor, usuario=usuario)
+
+@app.route('/api/reservas')
+@login_required
+def api_reservas():
+    usuario = usuario_atual()
+    reservas, proximo_cursor = paginar(
+        com_perfil(consulta_reservas(usuario), 'reservas'), ORDENACAO_RESERVAS, request.args.get('cursor')
+    )
+    return resposta_paginada(reservas, proximo_cursor, serializar_reserva)
+
+STATUS_RESERVA_INATIVOS = ['Cancelada', 'Rejeitada', 'Expirada']
+
+agendas_cache = {}
+agendas_cache_lock = threading.Lock()
+
+def inserir_ignorando_conflito(modelo, valores):
+    dialeto = db.engine.dialect.name
+    if dialeto == 'sqlite':
+        comando = sqlite.insert(modelo).on_conflict_do_nothing()
+    elif dialeto == 'postgresql':
+        comando = postgresql.insert(modelo).on_conflict_do_nothing()
+    else:
+        comando = db.insert(modelo).prefix_with('IGNORE')
+    return db.session.execute(comando, valores)
+
+def inserir_ou_atualizar(modelo, valores, chaves, atualizar):
+    dialeto = db.engine.dialect.name
+    if dialeto == 'sqlite':
+        comando = sqlite.insert(modelo)
+    elif dialeto == 'postgresql':
+        comando = postgresql.insert(modelo)
+    else:
+        comando = mysql.insert(modelo)
+        return db.session.execute(comando.on_duplicate_key_update(atualizar(comando.inserted)), valores)
+    comando = comando.on_conflict_do_update(index_elements=chaves, set_=atualizar(comando.excluded))
+    return db.session.execute(comando, valores)
+
+def travar_agenda(area, data):
+    inserir_ignorando_conflito(AgendaArea, [{'area': area, 'data': data, 'versao': 0}])
+    db.session.execute(
+        db.update(AgendaArea)
+        .where(AgendaArea.area == area, AgendaArea.data == data)
+        .values(versao=AgendaArea.versao + 1)
+    )
+
+def montar_agenda(intervalos):
+    inicios = [inicio for inicio, _, _ in intervalos]
+    fins_maximos = []
+    for _, fim, _ in intervalos:
+        fins_maximos.append(max(fim, fins_maximos[-1]) if fins_maximos else fim)
+    return {'intervalos': intervalos, 'inicios': inicios, 'fins_maximos': fins_maximos}
+
+def carregar_agenda(area, data, ignorar_reserva_id=None):
+    consulta = db.session.query(Reserva.horario_inicio, Reserva.horario_fim, Reserva.id).filter(
+        Reserva.area == area,
+        Reserva.data == data,
+        Reserva.status.notin_(STATUS_RESERVA_INATIVOS)
+    )
+    if ignorar_reserva_id is not None:
+        consulta = consulta.filter(Reserva.id != ignorar_reserva_id)
+    return montar_agenda([tuple(linha) for linha in consulta.order_by(Reserva.horario_inicio)])
+
+def horario_ocupado(agenda, inicio, fim):
+    posicao = bisect.bisect_left(agenda['inicios'], fim)
+    return posicao > 0 and agenda['fins_maximos'][posicao - 1] > inicio
+
+def horarios_livres(agenda, abertura, fechamento):
+    livres = []
+    cursor = abertura
+    for inicio, fim, _ in agenda['intervalos']:
+        if inicio > cursor:
+            livres.append((cursor, min(inicio, fechamento)))
+        cursor = max(cursor, fim)
+        if cursor >= fechamento:
+            break
+    if cursor < fechamento:
+        livres.append((cursor, fechamento))
+    return [(inicio, fim) for inicio, fim in livres if inicio < fim]
+
+def obter_agendas(area, data_inicial, dias):
+    datas = [data_inicial + timedelta(days=i) for i in range(dias)]
+    versoes = dict(db.session.query(AgendaArea.data, AgendaArea.versao).filter(
+        AgendaArea.area == area,
+        AgendaArea.data.between(datas[0], datas[-1])
+    ))
+    
+    agendas = {}
+    for data in datas:
+        chave = (area, data)
+        versao = versoes.get(data, 0)
+        entrada = agendas_cache.get(chave)
+        if not entrada or entrada[0] != versao:
+            entrada = (versao, carregar_agenda(area, data))
+            with agendas_cache_lock:
+                if len(agendas_cache) > 4096:
+                    agendas_cache.clear()
+                agendas_cache[chave] = entrada
+        agendas[data] = entrada[1]
+    return agendas
 
 @app.route('/cadastrar_reserva', methods=['GET', 'POST'])
 @login_required
 def cadastrar_reserva():
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = usuario_atual()
     
     if request.method == 'POST':
         try:
@@ -528,15 +2486,13 @@ def cadastrar_reserva():
             else:
                 morador_id = usuario.morador_id
             
-            conflito = Reserva.query.filter(
-                Reserva.area == area,
-                Reserva.data == data_reserva,
-                Reserva.status.notin_(['Cancelada', 'Rejeitada'])
-            ).filter(
-                and_(Reserva.horario_inicio < horario_fim, Reserva.horario_fim > horario_inicio)
-            ).first()
+            status = 'Pendente' if usuario.tipo != 'Admin' else request.form.get('status', 'Pendente')
             
-            if conflito:
+            travar_agenda(area, data_reserva)
+            if status not in STATUS_RESERVA_INATIVOS and horario_ocupado(
+                carregar_agenda(area, data_reserva), horario_inicio, horario_fim
+            ):
+                db.session.rollback()
                 flash('Já existe uma reserva aprovada ou pendente para este período.', 'error')
                 return redirect(url_for('cadastrar_reserva'))
             
@@ -547,7 +2503,7 @@ def cadastrar_reserva():
                 horario_inicio=horario_inicio,
                 horario_fim=horario_fim,
                 observacoes=observacoes,
-                status='Pendente' if usuario.tipo != 'Admin' else request.form.get('status', 'Pendente')
+                status=status
             )
             db.session.add(reserva)
             db.session.commit()
@@ -558,24 +2514,64 @@ def cadastrar_reserva():
             flash(f'Erro ao cadastrar reserva: {str(e)}', 'error')
     
     if usuario.tipo == 'Admin':
-        moradores = Morador.query.order_by(Morador.nome).all()
+        moradores = com_perfil(Morador.query, 'moradores_com_unidade').order_by(Morador.nome).all()
     else:
         moradores = [usuario.morador]
     
     return render_template('cadastrar_reserva.html', usuario=usuario, moradores=moradores)
 
+@app.route('/api/reservas/disponibilidade')
+@login_required
+def api_disponibilidade_reservas():
+    area = request.args.get('area', '').strip()
+    if not area:
+        return jsonify({'erro': 'Informe a área.'}), 400
+    
+    try:
+        data_inicial = datetime.strptime(request.args['data'], '%Y-%m-%d').date() if request.args.get('data') else date.today()
+        inicio = datetime.strptime(request.args['inicio'], '%H:%M').time() if request.args.get('inicio') else None
+        fim = datetime.strptime(request.args['fim'], '%H:%M').time() if request.args.get('fim') else None
+    except ValueError:
+        return jsonify({'erro': 'Data ou horário inválido.'}), 400
+    dias = max(1, min(request.args.get('dias', 7, type=int), app.config['DISPONIBILIDADE_DIAS_MAX']))
+    
+    agendas = obter_agendas(area, data_inicial, dias)
+    resposta = {
+        'area': area,
+        'dias': [{
+            'data': data.isoformat(),
+            'livres': [
+                [inicio_livre.strftime('%H:%M'), fim_livre.strftime('%H:%M')]
+                for inicio_livre, fim_livre in horarios_livres(
+                    agenda, app.config['RESERVA_ABERTURA'], app.config['RESERVA_FECHAMENTO']
+                )
+            ]
+        } for data, agenda in agendas.items()]
+    }
+    if inicio and fim:
+        resposta['disponivel'] = fim > inicio and not horario_ocupado(agendas[data_inicial], inicio, fim)
+    return jsonify(resposta)
+
 @app.route('/reservas/<int:reserva_id>/status', methods=['POST'])
 @admin_required
 def atualizar_status_reserva(reserva_id):
     reserva = Reserva.query.get_or_404(reserva_id)
     novo_status = request.form.get('status')
-    status_validos = ['Pendente', 'Aprovada', 'Rejeitada', 'Cancelada']
+    status_validos = ['Pendente', 'Aprovada', 'Rejeitada', 'Cancelada', 'Expirada']
     
     if novo_status not in status_validos:
         flash('Status inválido para reserva.', 'error')
         return redirect(url_for('listar_reservas'))
     
     try:
+        travar_agenda(reserva.area, reserva.data)
+        if novo_status not in STATUS_RESERVA_INATIVOS and horario_ocupado(
+            carregar_agenda(reserva.area, reserva.data, reserva.id), reserva.horario_inicio, reserva.horario_fim
+        ):
+            db.session.rollback()
+            flash('Já existe uma reserva aprovada ou pendente para este período.', 'error')
+            return redirect(url_for('listar_reservas'))
+        
         reserva.status = novo_status
         db.session.commit()
         flash('Status da reserva atualizado com sucesso!', 'success')
@@ -589,13 +2585,14 @@ def atualizar_status_reserva(reserva_id):
 @login_required
 def cancelar_reserva(reserva_id):
     reserva = Reserva.query.get_or_404(reserva_id)
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = usuario_atual()
     
     if usuario.tipo != 'Admin' and reserva.morador_id != usuario.morador_id:
         flash('Você não tem permissão para cancelar esta reserva.', 'error')
         return redirect(url_for('listar_reservas'))
     
     try:
+        travar_agenda(reserva.area, reserva.data)
         reserva.status = 'Cancelada'
         db.session.commit()
         flash('Reserva cancelada com sucesso!', 'success')
@@ -605,6 +2602,106 @@ def cancelar_reserva(reserva_id):
     
     return redirect(url_for('listar_reservas'))
 
+def exportacao_visitantes(usuario):
+    return consulta_visitantes(usuario).join(Visitante.unidade).with_entities(
+        Visitante.id,
+        Visitante.nome,
+        Visitante.cpf,
+        Visitante.telefone,
+        Unidade.bloco,
+        Unidade.numero.label('unidade'),
+        Visitante.data_entrada,
+        Visitante.data_saida,
+        Visitante.observacoes
+    ).order_by(Visitante.id)
+
+def exportacao_multas(usuario):
+    return consulta_multas(usuario).join(Multa.morador).join(Morador.unidade).with_entities(
+        Multa.id,
+        Morador.nome.label('morador'),
+        Morador.cpf,
+        Unidade.bloco,
+        Unidade.numero.label('unidade'),
+        db.type_coerce(Multa.valor_centavos, Centavos).label('valor'),
+        Multa.descricao,
+        Multa.data_vencimento,
+        Multa.data_pagamento,
+        Multa.status
+    ).order_by(Multa.id)
+
+def exportacao_reservas(usuario):
+    return consulta_reservas(usuario).join(Reserva.morador).join(Morador.unidade).with_entities(
+        Reserva.id,
+        Morador.nome.label('morador'),
+        Unidade.bloco,
+        Unidade.numero.label('unidade'),
+        Reserva.area,
+        Reserva.data,
+        Reserva.horario_inicio,
+        Reserva.horario_fim,
+        Reserva.status,
+        Reserva.observacoes
+    ).order_by(Reserva.id)
+
+EXPORTACOES = {
+    'visitantes': exportacao_visitantes,
+    'multas': exportacao_multas,
+    'reservas': exportacao_reservas
+}
+
+FORMATOS_EXPORTACAO = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson'
+}
+
+def valor_exportado(valor):
+    if isinstance(valor, (datetime, date, dt_time)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+def gerar_exportacao(consulta, formato):
+    colunas = [coluna['name'] for coluna in consulta.column_descriptions]
+    tamanho_lote = app.config['EXPORTACAO_TAMANHO_LOTE']
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    
+    if formato == 'csv':
+        escritor.writerow(colunas)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    
+    for indice, linha in enumerate(consulta.yield_per(tamanho_lote), 1):
+        valores = [valor_exportado(valor) for valor in linha]
+        if formato == 'csv':
+            escritor.writerow(valores)
+        else:
+            buffer.write(json.dumps(dict(zip(colunas, valores)), ensure_ascii=False) + '\n')
+        if indice % tamanho_lote == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@app.route('/exportar/<tipo>.<formato>')
+@login_required
+def exportar_dados(tipo, formato):
+    if tipo not in EXPORTACOES or formato not in FORMATOS_EXPORTACAO:
+        abort(404)
+    
+    usuario = usuario_atual()
+    consulta = EXPORTACOES[tipo](usuario)
+    nome_arquivo = f"{tipo}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{formato}"
+    return Response(
+        stream_with_context(gerar_exportacao(consulta, formato)),
+        mimetype=FORMATOS_EXPORTACAO[formato],
+        headers={'Content-Disposition': f'attachment; filename={nome_arquivo}'}
+    )
+
 @app.route('/funcionarios')
 @admin_required
 def listar_funcionarios():
@@ -705,39 +2802,130 @@ def excluir_funcionario(funcionario_id):
 @app.route('/notificacoes')
 @login_required
 def listar_notificacoes():
-    usuario = Usuario.query.get(session['user_id'])
-    
-    if usuario.tipo == 'Admin':
-        notificacoes_query = Notificacao.query.order_by(Notificacao.data_envio.desc())
-    else:
-        notificacoes_query = Notificacao.query.filter(
-            or_(Notificacao.morador_id == None, Notificacao.morador_id == usuario.morador_id)
-        ).order_by(Notificacao.data_envio.desc())
+    usuario = usuario_atual()
     
-    notificacoes = notificacoes_query.all()
+    notificacoes_query = consulta_notificacoes(usuario)
     
-    leituras_usuario = {
-        leitura.notificacao_id
-        for leitura in NotificacaoLeitura.query.filter_by(usuario_id=usuario.id).all()
-    }
-    notificacoes_nao_lidas_ids = [n.id for n in notificacoes if n.id not in leituras_usuario]
-    total_nao_lidas = len(notificacoes_nao_lidas_ids)
+    total_nao_lidas, ultima_nao_lida_id = consulta_notificacoes_nao_lidas(usuario).with_entities(
+        db.func.count(Notificacao.id),
+        db.func.max(Notificacao.id)
+    ).one()
     
     if total_nao_lidas:
-        for notificacao_id in notificacoes_nao_lidas_ids:
-            db.session.add(NotificacaoLeitura(
-                notificacao_id=notificacao_id,
-                usuario_id=usuario.id
-            ))
+        marcar_todas_notificacoes_lidas(usuario, ultima_nao_lida_id)
         db.session.commit()
+        invalidar_badges(usuario.id)
+    
+    notificacoes, proximo_cursor = paginar(
+        com_perfil(notificacoes_query, 'notificacoes'), ORDENACAO_NOTIFICACOES, request.args.get('cursor')
+    )
     
     return render_template(
         'notificacoes.html',
         notificacoes=notificacoes,
+        proximo_cursor=proximo_cursor,
         usuario=usuario,
-        notificacoes_nao_lidas_pendentes=total_nao_lidas,
-        notificacoes_ids_nao_lidas=notificacoes_nao_lidas_ids
+        notificacoes_nao_lidas_pendentes=total_nao_lidas
+    )
+
+@app.route('/api/notificacoes')
+@login_required
+def api_notificacoes():
+    usuario = usuario_atual()
+    notificacoes, proximo_cursor = paginar(
+        consulta_notificacoes(usuario), ORDENACAO_NOTIFICACOES, request.args.get('cursor')
     )
+    return resposta_paginada(notificacoes, proximo_cursor, serializar_notificacao)
+
+@app.route('/api/notificacoes/lidas', methods=['POST'])
+@login_required
+def api_marcar_notificacoes_lidas():
+    usuario = usuario_atual()
+    dados = request.get_json(silent=True) or {}
+    notificacao_ids = dados.get('ids')
+    
+    if notificacao_ids is None:
+        marcadas, ultima_id = consulta_notificacoes_nao_lidas(usuario).with_entities(
+            db.func.count(Notificacao.id),
+            db.func.max(Notificacao.id)
+        ).one()
+        if marcadas:
+            marcar_todas_notificacoes_lidas(usuario, ultima_id)
+    else:
+        if not isinstance(notificacao_ids, list) or not all(isinstance(i, int) for i in notificacao_ids):
+            return jsonify({'erro': 'Informe "ids" como uma lista de inteiros.'}), 400
+        marcadas = marcar_notificacoes_lidas(usuario, notificacao_ids)
+    
+    if marcadas:
+        db.session.commit()
+        invalidar_badges(usuario.id)
+    return jsonify({'marcadas': marcadas})
+
+PUBLICOS_NOTIFICACAO = {
+    'todos': 'Todos os moradores',
+    'morador': 'Um morador',
+    'bloco': 'Moradores de um bloco',
+    'tipo_unidade': 'Moradores por tipo de unidade',
+    'tipo_morador': 'Proprietários ou locatários',
+    'multas_abertas': 'Moradores com multas em aberto',
+    'multas_vencidas': 'Moradores com multas vencidas'
+}
+
+CAMPOS_PUBLICO_NOTIFICACAO = {
+    'morador': 'morador_id',
+    'bloco': 'bloco',
+    'tipo_unidade': 'tipo_unidade',
+    'tipo_morador': 'tipo_morador'
+}
+
+def filtrar_publico(consulta, publico, valor):
+    if publico not in PUBLICOS_NOTIFICACAO or publico == 'todos':
+        raise ValueError('público inválido')
+    if publico in CAMPOS_PUBLICO_NOTIFICACAO and not valor:
+        raise ValueError('selecione o destinatário')
+    if publico == 'morador':
+        return consulta.where(Morador.id == int(valor))
+    if publico == 'bloco':
+        return consulta.join(Unidade, Unidade.id == Morador.unidade_id).where(Unidade.bloco == valor)
+    if publico == 'tipo_unidade':
+        return consulta.join(Unidade, Unidade.id == Morador.unidade_id).where(Unidade.tipo == valor)
+    if publico == 'tipo_morador':
+        return consulta.where(Morador.tipo == valor)
+    campo = SaldoMultas.multas_abertas if publico == 'multas_abertas' else SaldoMultas.multas_vencidas
+    return consulta.join(SaldoMultas, and_(
+        SaldoMultas.escopo == 'morador', SaldoMultas.referencia_id == Morador.id
+    )).where(campo > 0)
+
+def enviar_notificacao_publico(titulo, mensagem, autor_id, publico, valor, enviar_email=False):
+    agora = datetime.utcnow()
+    if publico == 'todos':
+        notificacao = Notificacao(titulo=titulo, mensagem=mensagem, morador_id=None, autor_id=autor_id, data_envio=agora)
+        db.session.add(notificacao)
+        db.session.flush()
+        if enviar_email:
+            db.session.execute(db.insert(EnvioEmail).from_select(
+                ['notificacao_id', 'morador_id', 'status', 'tentativas', 'proxima_tentativa'],
+                db.select(db.literal(notificacao.id), Morador.id, db.literal('Pendente'), db.literal(0), db.literal(agora))
+            ))
+            antecipar_tarefa('enviar_emails')
+        return None
+    
+    criadas = db.session.execute(db.insert(Notificacao).from_select(
+        ['titulo', 'mensagem', 'morador_id', 'autor_id', 'data_envio'],
+        filtrar_publico(
+            db.select(db.literal(titulo), db.literal(mensagem), Morador.id, db.literal(autor_id), db.literal(agora)),
+            publico, valor
+        )
+    ).returning(Notificacao.id, Notificacao.morador_id)).all()
+    if not criadas:
+        raise ValueError('nenhum morador corresponde ao público selecionado')
+    if enviar_email:
+        db.session.execute(db.insert(EnvioEmail), [{
+            'notificacao_id': notificacao_id, 'morador_id': morador_id,
+            'status': 'Pendente', 'tentativas': 0, 'proxima_tentativa': agora
+        } for notificacao_id, morador_id in criadas])
+        antecipar_tarefa('enviar_emails')
+    return len(criadas)
 
 @app.route('/cadastrar_notificacao', methods=['GET', 'POST'])
 @admin_required
@@ -746,26 +2934,35 @@ def cadastrar_notificacao():
         try:
             titulo = request.form['titulo'].strip()
             mensagem = request.form['mensagem'].strip()
-            destinatario = request.form.get('destinatario')
-            morador_id = None if destinatario == 'todos' else int(destinatario)
-            autor_id = session['user_id']
+            publico = request.form.get('publico', 'todos')
+            campo_valor = CAMPOS_PUBLICO_NOTIFICACAO.get(publico)
+            valor = request.form.get(campo_valor, '').strip() if campo_valor else None
+            enviar_email = request.form.get('enviar_email') == '1'
             
-            notificacao = Notificacao(
-                titulo=titulo,
-                mensagem=mensagem,
-                morador_id=morador_id,
-                autor_id=autor_id
-            )
-            db.session.add(notificacao)
+            destinatarios = enviar_notificacao_publico(titulo, mensagem, session['user_id'], publico, valor, enviar_email)
             db.session.commit()
-            flash('Notificação enviada com sucesso!', 'success')
+            invalidar_badges()
+            if enviar_email:
+                despertar_agendador.set()
+            if destinatarios is None:
+                flash('Notificação enviada a todos os moradores!', 'success')
+            else:
+                flash(f'Notificação enviada para {destinatarios} morador(es)!', 'success')
             return redirect(url_for('listar_notificacoes'))
         except Exception as e:
             db.session.rollback()
             flash(f'Erro ao enviar notificação: {str(e)}', 'error')
     
-    moradores = Morador.query.order_by(Morador.nome).all()
-    return render_template('cadastrar_notificacao.html', moradores=moradores)
+    moradores = com_perfil(Morador.query, 'moradores_com_unidade').order_by(Morador.nome).all()
+    blocos = sorted({morador.unidade.bloco for morador in moradores})
+    tipos_unidade = sorted({morador.unidade.tipo for morador in moradores})
+    return render_template(
+        'cadastrar_notificacao.html',
+        moradores=moradores,
+        blocos=blocos,
+        tipos_unidade=tipos_unidade,
+        publicos=PUBLICOS_NOTIFICACAO
+    )
 
 @app.route('/notificacoes/<int:notificacao_id>/excluir', methods=['POST'])
 @admin_required
@@ -774,6 +2971,7 @@ def excluir_notificacao(notificacao_id):
     try:
         db.session.delete(notificacao)
         db.session.commit()
+        invalidar_badges()
         flash('Notificação removida com sucesso!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -782,59 +2980,19 @@ def excluir_notificacao(notificacao_id):
     return redirect(url_for('listar_notificacoes'))
 
 def obter_conversas(usuario):
-    mensagens_relacionadas = ChatMensagem.query.filter(
-        or_(ChatMensagem.remetente_id == usuario.id, ChatMensagem.destinatario_id == usuario.id)
-    ).order_by(ChatMensagem.enviada_em.desc()).all()
-    
-    conversas_temp = {}
-    usuarios_ids = set()
-    
-    for mensagem in mensagens_relacionadas:
-        outro_id = mensagem.destinatario_id if mensagem.remetente_id == usuario.id else mensagem.remetente_id
-        if outro_id == usuario.id:
-            continue
-        usuarios_ids.add(outro_id)
-        existente = conversas_temp.get(outro_id)
-        if not existente or mensagem.enviada_em > existente['ultima_data']:
-            conversas_temp[outro_id] = {
-                'ultima_mensagem': mensagem,
-                'ultima_data': mensagem.enviada_em
-            }
-    
-    usuarios_map = {}
-    if usuarios_ids:
-        usuarios_map = {
-            u.id: u for u in Usuario.query.filter(Usuario.id.in_(usuarios_ids)).all()
-        }
-    
-    nao_lidas_por_usuario = {
-        row.remetente_id: row.total
-        for row in db.session.query(
-            ChatMensagem.remetente_id,
-            db.func.count(ChatMensagem.id).label('total')
-        ).filter(
-            ChatMensagem.destinatario_id == usuario.id,
-            ChatMensagem.lida_em == None
-        ).group_by(ChatMensagem.remetente_id)
-    }
-    
-    conversas = []
-    for outro_id, dados in conversas_temp.items():
-        outro_usuario = usuarios_map.get(outro_id)
-        if not outro_usuario:
-            continue
-        conversas.append({
-            'usuario': outro_usuario,
-            'ultima_mensagem': dados['ultima_mensagem'],
-            'ultima_data': dados['ultima_data'],
-            'nao_lidas': nao_lidas_por_usuario.get(outro_id, 0)
-        })
-    
-    conversas.sort(key=lambda c: c['ultima_data'] or datetime.min, reverse=True)
-    return conversas
+    resumos = com_perfil(ConversaResumo.query, 'conversas').filter(
+        ConversaResumo.usuario_id == usuario.id
+    ).order_by(ConversaResumo.ultima_data.desc(), ConversaResumo.id.desc()).all()
+    
+    return [{
+        'usuario': resumo.contato,
+        'ultima_mensagem': resumo.ultima_mensagem,
+        'ultima_data': resumo.ultima_data,
+        'nao_lidas': resumo.nao_lidas
+    } for resumo in resumos]
 
 def usuarios_disponiveis_para_chat(usuario):
-    consulta = Usuario.query.filter(Usuario.id != usuario.id, Usuario.ativo == True)
+    consulta = com_perfil(Usuario.query, 'usuarios_chat').filter(Usuario.id != usuario.id, Usuario.ativo == True)
     if usuario.tipo != 'Admin':
         consulta = consulta.filter(Usuario.tipo == 'Admin')
     return consulta.order_by(Usuario.username).all()
@@ -848,10 +3006,115 @@ def validar_destinatario_chat(usuario, destinatario):
         return True
     return destinatario.tipo == 'Admin'
 
+class BrokerMemoria:
+    def __init__(self, tamanho_fila=100):
+        self.tamanho_fila = tamanho_fila
+        self.assinantes = {}
+        self.lock = threading.Lock()
+    
+    def assinar(self, canal):
+        fila = queue.Queue(maxsize=self.tamanho_fila)
+        with self.lock:
+            self.assinantes.setdefault(canal, set()).add(fila)
+        return fila
+    
+    def cancelar(self, canal, fila):
+        with self.lock:
+            filas = self.assinantes.get(canal)
+            if filas:
+                filas.discard(fila)
+                if not filas:
+                    del self.assinantes[canal]
+    
+    def publicar(self, canal, evento):
+        with self.lock:
+            filas = list(self.assinantes.get(canal, ()))
+        for fila in filas:
+            try:
+                fila.put_nowait(evento)
+            except queue.Full:
+                pass
+
+broker_chat = BrokerMemoria(app.config['CHAT_SSE_TAMANHO_FILA'])
+
+def canal_usuario(usuario_id):
+    return f'usuario:{usuario_id}'
+
+def atualizar_resumos_conversa(mensagem):
+    valores = [
+        {
+            'usuario_id': usuario_id,
+            'contato_id': contato_id,
+            'ultima_mensagem_id': mensagem.id,
+            'ultima_data': mensagem.enviada_em,
+            'nao_lidas': nao_lidas
+        }
+        for usuario_id, contato_id, nao_lidas in (
+            (mensagem.remetente_id, mensagem.destinatario_id, 0),
+            (mensagem.destinatario_id, mensagem.remetente_id, 1)
+        )
+    ]
+    inserir_ou_atualizar(ConversaResumo, valores, ['usuario_id', 'contato_id'], lambda novo: {
+        'ultima_mensagem_id': novo.ultima_mensagem_id,
+        'ultima_data': novo.ultima_data,
+        'nao_lidas': ConversaResumo.nao_lidas + novo.nao_lidas
+    })
+
+def enviar_mensagem_chat(usuario, destinatario, texto):
+    mensagem = ChatMensagem(
+        remetente_id=usuario.id,
+        destinatario_id=destinatario.id,
+        mensagem=texto
+    )
+    db.session.add(mensagem)
+    db.session.flush()
+    atualizar_resumos_conversa(mensagem)
+    db.session.commit()
+    invalidar_badges(destinatario.id)
+    
+    evento = {'tipo': 'mensagem', 'id': mensagem.id, 'dados': serializar_mensagem(mensagem)}
+    broker_chat.publicar(canal_usuario(destinatario.id), evento)
+    broker_chat.publicar(canal_usuario(usuario.id), evento)
+    return mensagem
+
+def marcar_mensagens_lidas(usuario, remetente_id):
+    lida_em = datetime.utcnow()
+    atualizados = ChatMensagem.query.filter_by(
+        remetente_id=remetente_id,
+        destinatario_id=usuario.id,
+        lida_em=None
+    ).update(
+        {ChatMensagem.lida_em: lida_em},
+        synchronize_session=False
+    )
+    if atualizados:
+        ConversaResumo.query.filter_by(
+            usuario_id=usuario.id,
+            contato_id=remetente_id
+        ).update(
+            {ConversaResumo.nao_lidas: 0},
+            synchronize_session=False
+        )
+        db.session.commit()
+        invalidar_badges(usuario.id)
+        broker_chat.publicar(canal_usuario(remetente_id), {
+            'tipo': 'leitura',
+            'dados': {'leitor_id': usuario.id, 'lida_em': lida_em.isoformat()}
+        })
+    return atualizados
+
+def formatar_evento_sse(evento):
+    linhas = []
+    if evento.get('id') is not None:
+        linhas.append(f"id: {evento['id']}")
+    linhas.append(f"event: {evento['tipo']}")
+    linhas.append(f"data: {json.dumps(evento['dados'], ensure_ascii=False)}")
+    return '\n'.join(linhas) + '\n\n'
+
 @app.route('/chat')
 @login_required
 def chat_home():
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = usuario_atual()
     if not usuario:
         flash('Sessão inválida. Faça login novamente.', 'error')
         return redirect(url_for('logout'))
@@ -875,13 +3138,13 @@ def chat_home():
 @app.route('/chat/<int:destinatario_id>', methods=['GET', 'POST'])
 @login_required
 def chat_conversa(destinatario_id):
-    usuario = Usuario.query.get(session['user_id'])
-    destinatario = Usuario.query.get_or_404(destinatario_id)
-    
+    usuario = usuario_atual()
     if not usuario:
         flash('Sessão inválida. Faça login novamente.', 'error')
         return redirect(url_for('logout'))
     
+    destinatario = com_perfil(Usuario.query, 'usuarios_chat').filter_by(id=destinatario_id).first_or_404()
+    
     if not validar_destinatario_chat(usuario, destinatario):
         flash('Você não tem permissão para conversar com este usuário.', 'error')
         return redirect(url_for('chat_home'))
@@ -892,29 +3155,14 @@ def chat_conversa(destinatario_id):
             flash('Digite uma mensagem antes de enviar.', 'error')
         else:
             try:
-                mensagem = ChatMensagem(
-                    remetente_id=usuario.id,
-                    destinatario_id=destinatario.id,
-                    mensagem=mensagem_texto
-                )
-                db.session.add(mensagem)
-                db.session.commit()
+                enviar_mensagem_chat(usuario, destinatario, mensagem_texto)
                 flash('Mensagem enviada!', 'success')
             except Exception as e:
                 db.session.rollback()
                 flash(f'Erro ao enviar mensagem: {str(e)}', 'error')
         return redirect(url_for('chat_conversa', destinatario_id=destinatario.id))
     
-    atualizados = ChatMensagem.query.filter_by(
-        remetente_id=destinatario.id,
-        destinatario_id=usuario.id,
-        lida_em=None
-    ).update(
-        {ChatMensagem.lida_em: datetime.utcnow()},
-        synchronize_session=False
-    )
-    if atualizados:
-        db.session.commit()
+    marcar_mensagens_lidas(usuario, destinatario.id)
     
     conversas = obter_conversas(usuario)
     if destinatario.id not in [c['usuario'].id for c in conversas]:
@@ -926,12 +3174,10 @@ def chat_conversa(destinatario_id):
         })
     conversas.sort(key=lambda c: c['ultima_data'] or datetime.min, reverse=True)
     
-    mensagens = ChatMensagem.query.filter(
-        or_(
-            and_(ChatMensagem.remetente_id == usuario.id, ChatMensagem.destinatario_id == destinatario.id),
-            and_(ChatMensagem.remetente_id == destinatario.id, ChatMensagem.destinatario_id == usuario.id)
-        )
-    ).order_by(ChatMensagem.enviada_em.asc()).all()
+    mensagens, cursor_anteriores = paginar(
+        consulta_mensagens_conversa(usuario, destinatario), ORDENACAO_MENSAGENS, request.args.get('cursor')
+    )
+    mensagens.reverse()
     
     usuarios_disponiveis = usuarios_disponiveis_para_chat(usuario)
     
@@ -941,10 +3187,517 @@ def chat_conversa(destinatario_id):
         conversas=conversas,
         usuarios_disponiveis=usuarios_disponiveis,
         destinatario=destinatario,
-        mensagens=mensagens
+        mensagens=mensagens,
+        cursor_anteriores=cursor_anteriores
     )
 
-if __name__ == '__main__':
+@app.route('/api/chat/<int:destinatario_id>/mensagens')
+@login_required
+def api_chat_mensagens(destinatario_id):
+    usuario = usuario_atual()
+    destinatario = Usuario.query.get_or_404(destinatario_id)
+    if not validar_destinatario_chat(usuario, destinatario):
+        abort(403)
+    
+    mensagens, proximo_cursor = paginar(
+        consulta_mensagens_conversa(usuario, destinatario), ORDENACAO_MENSAGENS, request.args.get('cursor')
+    )
+    return resposta_paginada(mensagens, proximo_cursor, serializar_mensagem)
+
+@app.route('/api/chat/<int:destinatario_id>/mensagens', methods=['POST'])
+@login_required
+def api_enviar_mensagem_chat(destinatario_id):
+    usuario = usuario_atual()
+    destinatario = Usuario.query.get_or_404(destinatario_id)
+    if not validar_destinatario_chat(usuario, destinatario):
+        abort(403)
+    
+    dados = request.get_json(silent=True) or request.form
+    texto = (dados.get('mensagem') or '').strip()
+    if not texto:
+        return jsonify({'erro': 'Digite uma mensagem antes de enviar.'}), 400
+    
+    mensagem = enviar_mensagem_chat(usuario, destinatario, texto)
+    return jsonify(serializar_mensagem(mensagem)), 201
+
+@app.route('/api/chat/<int:remetente_id>/lidas', methods=['POST'])
+@login_required
+def api_marcar_mensagens_lidas(remetente_id):
+    usuario = usuario_atual()
+    return jsonify({'atualizadas': marcar_mensagens_lidas(usuario, remetente_id)})
+
+@app.route('/chat/eventos')
+@login_required
+def chat_eventos():
+    usuario_id = session['user_id']
+    ultimo_id = request.headers.get('Last-Event-ID', type=int) or request.args.get('desde', type=int)
+    canal = canal_usuario(usuario_id)
+    fila = broker_chat.assinar(canal)
+    
+    pendentes = []
+    if ultimo_id:
+        pendentes = [
+            {'tipo': 'mensagem', 'id': mensagem.id, 'dados': serializar_mensagem(mensagem)}
+            for mensagem in ChatMensagem.query.filter(
+                ChatMensagem.id > ultimo_id,
+                or_(ChatMensagem.remetente_id == usuario_id, ChatMensagem.destinatario_id == usuario_id)
+            ).order_by(ChatMensagem.id).limit(app.config['PAGE_SIZE_MAX'])
+        ]
+    db.session.close()
+    
+    keepalive = app.config['CHAT_SSE_KEEPALIVE']
+    encerrar_em = time.monotonic() + app.config['CHAT_SSE_DURACAO_MAXIMA']
+    
+    def gerar():
+        try:
+            yield 'retry: 3000\n\n'
+            for evento in pendentes:
+                yield formatar_evento_sse(evento)
+            while True:
+                restante = encerrar_em - time.monotonic()
+                if restante <= 0:
+                    return
+                try:
+                    evento = fila.get(timeout=min(keepalive, restante))
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield formatar_evento_sse(evento)
+        finally:
+            broker_chat.cancelar(canal, fila)
+    
+    return Response(gerar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+CONSULTAS_FREQUENTES = {
+    'visitantes_ativos': lambda: Visitante.query.filter(Visitante.data_saida == None),
+    'visitantes_ativos_unidade': lambda: Visitante.query.filter_by(unidade_id=1, data_saida=None),
+    'pagina_visitantes': lambda: Visitante.query.order_by(Visitante.data_entrada.desc(), Visitante.id.desc()).limit(51),
+    'multas_pendentes': lambda: Multa.query.filter_by(status='Pendente'),
+    'multas_morador': lambda: Multa.query.filter_by(morador_id=1, status='Pendente'),
+    'pagina_multas': lambda: Multa.query.order_by(Multa.data_vencimento.desc(), Multa.id.desc()).limit(51),
+    'moradores_unidade': lambda: Morador.query.filter_by(unidade_id=1),
+    'conflito_reserva': lambda: Reserva.query.filter(
+        Reserva.area == 'Salão de Festas',
+        Reserva.data == date(2030, 1, 1),
+        Reserva.status.notin_(['Cancelada', 'Rejeitada']),
+        Reserva.horario_inicio < dt_time(12), Reserva.horario_fim > dt_time(10)
+    ),
+    'reservas_morador': lambda: Reserva.query.filter_by(morador_id=1),
+    'notificacoes_morador': lambda: Notificacao.query.filter(
+        or_(Notificacao.morador_id == None, Notificacao.morador_id == 1)
+    ),
+    'pagina_notificacoes': lambda: Notificacao.query.order_by(Notificacao.data_envio.desc(), Notificacao.id.desc()).limit(51),
+    'chat_nao_lidas': lambda: ChatMensagem.query.filter_by(destinatario_id=1, lida_em=None),
+    'chat_conversa': lambda: ChatMensagem.query.filter(
+        or_(
+            and_(ChatMensagem.remetente_id == 1, ChatMensagem.destinatario_id == 2),
+            and_(ChatMensagem.remetente_id == 2, ChatMensagem.destinatario_id == 1)
+        )
+    ).order_by(ChatMensagem.enviada_em.desc()),
+}
+
+def plano_consulta(query):
+    dialeto = db.engine.dialect
+    sql = str(query.statement.compile(dialect=dialeto, compile_kwargs={'literal_binds': True}))
+    with db.engine.connect() as conexao:
+        if dialeto.name == 'sqlite':
+            return [linha[-1] for linha in conexao.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql)]
+        return [linha[0] for linha in conexao.exec_driver_sql('EXPLAIN ' + sql)]
+
+def usa_indice(plano):
+    for linha in plano:
+        if 'Seq Scan' in linha:
+            return False
+        partes = linha.split()
+        if len(partes) == 2 and partes[0] == 'SCAN':
+            return False
+    return True
+
+def verificar_indices():
+    return {
+        nome: (usa_indice(plano), plano)
+        for nome, plano in ((nome, plano_consulta(consulta())) for nome, consulta in CONSULTAS_FREQUENTES.items())
+    }
+
+def metricas_autorizadas():
+    token = app.config['METRICAS_TOKEN']
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    if 'user_id' not in session:
+        return False
+    identidade = identidade_atual()
+    return bool(identidade) and identidade['tipo'] == 'Admin'
+
+@app.route('/metrics')
+def exportar_metricas():
+    if not metricas_autorizadas():
+        abort(403)
+    return Response(metricas.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def autor_notificacoes_automaticas():
+    return db.session.query(db.func.min(Usuario.id)).filter(Usuario.tipo == 'Admin', Usuario.ativo == True).scalar()
+
+def processar_em_lotes(modelo, filtros, processar):
+    total = 0
+    while True:
+        ids = [registro_id for (registro_id,) in db.session.query(modelo.id).filter(*filtros).order_by(modelo.id).limit(
+            app.config['TAREFAS_TAMANHO_LOTE']
+        )]
+        if not ids:
+            return total
+        processar(ids)
+        db.session.commit()
+        total += len(ids)
+
+def tarefa_vencer_multas():
+    grupos = vencer_multas()
+    autor = autor_notificacoes_automaticas()
+    if grupos and autor:
+        agora = datetime.utcnow()
+        db.session.execute(db.insert(Notificacao), [{
+            'titulo': 'Multa vencida',
+            'mensagem': f'{quantidade} multa(s) passou(aram) do vencimento sem pagamento, somando R$ {Decimal(centavos).scaleb(-2):.2f}.',
+            'morador_id': morador_id,
+            'autor_id': autor,
+            'data_envio': agora
+        } for morador_id, _, quantidade, centavos in grupos])
+    db.session.commit()
+    return sum(quantidade for _, _, quantidade, _ in grupos)
+
+def tarefa_encerrar_visitas():
+    agora = datetime.utcnow()
+    horas = app.config['VISITA_DURACAO_MAXIMA_HORAS']
+    autor = autor_notificacoes_automaticas()
+    
+    def encerrar(ids):
+        selecionados = Visitante.id.in_(ids)
+        if autor:
+            db.session.execute(db.insert(Notificacao).from_select(
+                ['titulo', 'mensagem', 'morador_id', 'autor_id', 'data_envio'],
+                db.select(
+                    db.literal('Visita encerrada automaticamente'),
+                    db.literal('A visita de ') + Visitante.nome + db.literal(f' ficou mais de {horas} horas sem saída registrada e foi encerrada.'),
+                    Morador.id,
+                    db.literal(autor),
+                    db.literal(agora)
+                ).join(Morador, Morador.unidade_id == Visitante.unidade_id).where(selecionados)
+            ))
+        registrar_alteracoes_selecionadas(Visitante, selecionados)
+        db.session.execute(db.update(Visitante).where(selecionados).values(
+            data_saida=agora,
+            observacoes=db.func.coalesce(Visitante.observacoes + '\n', '') + 'Saída registrada automaticamente.'
+        ).execution_options(synchronize_session=False))
+    
+    return processar_em_lotes(
+        Visitante, [Visitante.data_saida == None, Visitante.data_entrada < agora - timedelta(hours=horas)], encerrar
+    )
+
+def tarefa_expirar_reservas():
+    agora = datetime.now()
+    autor = autor_notificacoes_automaticas()
+    
+    def expirar(ids):
+        selecionadas = Reserva.id.in_(ids)
+        if autor:
+            db.session.execute(db.insert(Notificacao).from_select(
+                ['titulo', 'mensagem', 'morador_id', 'autor_id', 'data_envio'],
+                db.select(
+                    db.literal('Reserva expirada'),
+                    db.literal('A solicitação de reserva de ') + Reserva.area + db.literal(' para ')
+                    + db.cast(Reserva.data, db.String) + db.literal(' expirou sem aprovação.'),
+                    Reserva.morador_id,
+                    db.literal(autor),
+                    db.literal(datetime.utcnow())
+                ).where(selecionadas)
+            ))
+        registrar_alteracoes_selecionadas(Reserva, selecionadas)
+        db.session.execute(db.update(AgendaArea).where(
+            db.tuple_(AgendaArea.area, AgendaArea.data).in_(db.select(Reserva.area, Reserva.data).where(selecionadas))
+        ).values(versao=AgendaArea.versao + 1).execution_options(synchronize_session=False))
+        db.session.execute(db.update(Reserva).where(selecionadas).values(status='Expirada').execution_options(synchronize_session=False))
+    
+    return processar_em_lotes(Reserva, [
+        Reserva.status == 'Pendente',
+        or_(Reserva.data < agora.date(), and_(Reserva.data == agora.date(), Reserva.horario_inicio <= agora.time()))
+    ], expirar)
+
+class EntregadorSmtp:
+    def enviar(self, mensagens):
+        falhas = {}
+        with smtplib.SMTP(app.config['EMAIL_SMTP_HOST'], app.config['EMAIL_SMTP_PORTA'], timeout=10) as smtp:
+            for envio_id, mensagem in mensagens:
+                try:
+                    smtp.send_message(mensagem)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                    falhas[envio_id] = f'{type(e).__name__}: {e}'
+        return falhas
+
+entregador_email = EntregadorSmtp()
+
+def montar_email(nome, email, titulo, mensagem):
+    email_mensagem = EmailMessage()
+    email_mensagem['From'] = app.config['EMAIL_REMETENTE']
+    email_mensagem['To'] = formataddr((nome, email))
+    email_mensagem['Subject'] = titulo
+    email_mensagem.set_content(mensagem)
+    return email_mensagem
+
+def tarefa_enviar_emails():
+    enviados = 0
+    while True:
+        agora = datetime.utcnow()
+        lote = db.session.query(
+            EnvioEmail.id, EnvioEmail.tentativas, Morador.nome, Morador.email, Notificacao.titulo, Notificacao.mensagem
+        ).join(Morador, Morador.id == EnvioEmail.morador_id).join(Notificacao, Notificacao.id == EnvioEmail.notificacao_id).filter(
+            EnvioEmail.status == 'Pendente', EnvioEmail.proxima_tentativa <= agora
+        ).order_by(EnvioEmail.id).limit(app.config['EMAIL_TAMANHO_LOTE']).all()
+        db.session.rollback()
+        if not lote:
+            return enviados
+        
+        try:
+            falhas = entregador_email.enviar([
+                (envio.id, montar_email(envio.nome, envio.email, envio.titulo, envio.mensagem)) for envio in lote
+            ])
+        except Exception as e:
+            falhas = {envio.id: f'{type(e).__name__}: {e}' for envio in lote}
+            log_tarefas.warning('email_lote_falhou', extra={'dados': {'envios': len(lote), 'erro': falhas[lote[0].id]}})
+        
+        agora = datetime.utcnow()
+        entregues = [envio.id for envio in lote if envio.id not in falhas]
+        if entregues:
+            db.session.execute(db.update(EnvioEmail).where(EnvioEmail.id.in_(entregues)).values(
+                status='Enviado', enviado_em=agora, tentativas=EnvioEmail.tentativas + 1, ultimo_erro=None
+            ).execution_options(synchronize_session=False))
+        if falhas:
+            tabela = EnvioEmail.__table__
+            db.session.execute(
+                tabela.update().where(tabela.c.id == db.bindparam('envio_id')).values(
+                    status=db.bindparam('novo_status'),
+                    tentativas=db.bindparam('novas_tentativas'),
+                    proxima_tentativa=db.bindparam('nova_tentativa'),
+                    ultimo_erro=db.bindparam('erro')
+                ),
+                [{
+                    'envio_id': envio.id,
+                    'novo_status': 'Falhou' if envio.tentativas + 1 >= app.config['EMAIL_MAX_TENTATIVAS'] else 'Pendente',
+                    'novas_tentativas': envio.tentativas + 1,
+                    'nova_tentativa': agora + timedelta(seconds=60 * 2 ** envio.tentativas),
+                    'erro': falhas[envio.id][:2000]
+                } for envio in lote if envio.id in falhas]
+            )
+        db.session.commit()
+        enviados += len(entregues)
+
+TAREFAS = {
+    'vencer_multas': (tarefa_vencer_multas, 3600),
+    'encerrar_visitas': (tarefa_encerrar_visitas, 900),
+    'expirar_reservas': (tarefa_expirar_reservas, 900),
+    'enviar_emails': (tarefa_enviar_emails, 300)
+}
+
+def registrar_tarefas():
+    inserir_ignorando_conflito(TarefaAgendada, [{
+        'nome': nome, 'intervalo_segundos': intervalo, 'ativa': True,
+        'proxima_execucao': datetime.utcnow(), 'falhas_consecutivas': 0
+    } for nome, (_, intervalo) in TAREFAS.items()])
+    db.session.commit()
+
+def reservar_tarefa(nome, agora, forcar=False):
+    filtros = [
+        TarefaAgendada.nome == nome,
+        TarefaAgendada.ativa == True,
+        or_(TarefaAgendada.executando_ate == None, TarefaAgendada.executando_ate < agora)
+    ]
+    if not forcar:
+        filtros.append(TarefaAgendada.proxima_execucao <= agora)
+    resultado = db.session.execute(
+        db.update(TarefaAgendada).where(*filtros)
+        .values(executando_ate=agora + timedelta(seconds=app.config['AGENDADOR_TEMPO_LIMITE']))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return resultado.rowcount == 1
+
+def executar_tarefa(nome, forcar=False):
+    agora = datetime.utcnow()
+    if not reservar_tarefa(nome, agora, forcar):
+        return None
+    inicio = time.perf_counter()
+    try:
+        processados = TAREFAS[nome][0]()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        tarefa = db.session.get(TarefaAgendada, nome)
+        tarefa.falhas_consecutivas += 1
+        tarefa.ultimo_erro = f'{type(e).__name__}: {e}'[:2000]
+        tarefa.proxima_execucao = datetime.utcnow() + timedelta(
+            seconds=min(tarefa.intervalo_segundos, 60 * 2 ** min(tarefa.falhas_consecutivas, 6))
+        )
+        tarefa.executando_ate = None
+        db.session.commit()
+        log_tarefas.error('tarefa_falhou', extra={'dados': {'tarefa': nome, 'erro': tarefa.ultimo_erro}})
+        return None
+    
+    tarefa = db.session.get(TarefaAgendada, nome)
+    tarefa.ultima_execucao = agora
+    tarefa.ultima_duracao_ms = int((time.perf_counter() - inicio) * 1000)
+    tarefa.ultimo_resultado = processados
+    tarefa.ultimo_erro = None
+    tarefa.falhas_consecutivas = 0
+    tarefa.proxima_execucao = agora + timedelta(seconds=tarefa.intervalo_segundos)
+    tarefa.executando_ate = None
+    db.session.commit()
+    log_tarefas.info('tarefa_executada', extra={'dados': {
+        'tarefa': nome, 'processados': processados, 'duracao_ms': tarefa.ultima_duracao_ms
+    }})
+    if processados:
+        invalidar_badges()
+    return processados
+
+def antecipar_tarefa(nome):
+    agora = datetime.utcnow()
+    db.session.execute(
+        db.update(TarefaAgendada).where(TarefaAgendada.nome == nome, TarefaAgendada.proxima_execucao > agora)
+        .values(proxima_execucao=agora).execution_options(synchronize_session=False)
+    )
+
+def executar_tarefas_pendentes():
+    pendentes = [nome for (nome,) in db.session.query(TarefaAgendada.nome).filter(
+        TarefaAgendada.ativa == True,
+        TarefaAgendada.proxima_execucao <= datetime.utcnow(),
+        TarefaAgendada.nome.in_(TAREFAS)
+    ).order_by(TarefaAgendada.proxima_execucao)]
+    db.session.rollback()
+    return {nome: executar_tarefa(nome) for nome in pendentes}
+
+def espera_proxima_tarefa():
+    proxima = db.session.query(db.func.min(TarefaAgendada.proxima_execucao)).filter(TarefaAgendada.ativa == True).scalar()
+    db.session.rollback()
+    espera = app.config['AGENDADOR_ESPERA_MAXIMA']
+    if proxima:
+        espera = min(espera, (proxima - datetime.utcnow()).total_seconds())
+    return max(espera, 1)
+
+def ciclo_agendador(parar):
+    with app.app_context():
+        registrar_tarefas()
+    while not parar.is_set():
+        with app.app_context():
+            try:
+                executar_tarefas_pendentes()
+                espera = espera_proxima_tarefa()
+            except Exception as e:
+                db.session.rollback()
+                log_tarefas.error('agendador_falhou', extra={'dados': {'erro': f'{type(e).__name__}: {e}'}})
+                espera = app.config['AGENDADOR_ESPERA_MAXIMA']
+        if despertar_agendador.wait(espera):
+            despertar_agendador.clear()
+
+agendador = None
+despertar_agendador = threading.Event()
+
+def iniciar_agendador():
+    global agendador
+    if agendador and agendador.pid == os.getpid() and agendador.is_alive():
+        return
+    parar = threading.Event()
+    thread = threading.Thread(target=ciclo_agendador, args=(parar,), name='agendador', daemon=True)
+    thread.pid = os.getpid()
+    thread.parar = parar
+    thread.start()
+    agendador = thread
+
+def parar_agendador():
+    if agendador:
+        agendador.parar.set()
+        despertar_agendador.set()
+        agendador.join(timeout=app.config['AGENDADOR_ESPERA_MAXIMA'])
+
+def criar_app(config=None, agendador=True):
+    if config:
+        app.config.update(config)
+    if 'sqlalchemy' not in app.extensions:
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', opcoes_engine(app.config['SQLALCHEMY_DATABASE_URI']))
+        db.init_app(app)
+    iniciar_logs()
+    if agendador and app.config['AGENDADOR_EMBUTIDO']:
+        iniciar_agendador()
+    return app
+
+def preparar_banco():
     with app.app_context():
         db.create_all()
+        novas = aplicar_migracoes()
+        for engine in db.engines.values():
+            engine.dispose()
+    return novas
+
+def reiniciar_estado_processo():
+    global reconstrucao_checkin, reconstrucao_checkin_lock
+    if 'sqlalchemy' in app.extensions:
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+    for cache, lock in (
+        (badges_cache, badges_cache_lock),
+        (identidades_cache, identidades_cache_lock),
+        (agendas_cache, agendas_cache_lock),
+        (broker_chat.assinantes, broker_chat.lock),
+        (limitador_login.baldes, limitador_login.lock),
+        (respostas_cache, respostas_cache_lock),
+        (limitador_log_consultas.baldes, limitador_log_consultas.lock)
+    ):
+        with lock:
+            cache.clear()
+    metricas.limpar()
+    indice_checkin.lock = threading.RLock()
+    reconstrucao_checkin = None
+    reconstrucao_checkin_lock = threading.Lock()
+    if ouvinte_log:
+        iniciar_logs()
+    if agendador:
+        iniciar_agendador()
+
+os.register_at_fork(after_in_child=reiniciar_estado_processo)
+
+@app.cli.command('migrar')
+def comando_migrar():
+    db.create_all()
+    novas = aplicar_migracoes()
+    print(f'Migrações aplicadas: {novas}' if novas else 'Banco de dados já está atualizado.')
+
+@app.cli.command('agendador')
+def comando_agendador():
+    try:
+        ciclo_agendador(threading.Event())
+    except KeyboardInterrupt:
+        pass
+
+@app.cli.command('executar-tarefas')
+@click.argument('nomes', nargs=-1)
+def comando_executar_tarefas(nomes):
+    registrar_tarefas()
+    for nome in nomes or TAREFAS:
+        if nome not in TAREFAS:
+            raise click.BadParameter(f'tarefa desconhecida: {nome}')
+        processados = executar_tarefa(nome, forcar=True)
+        print(f'{nome}: ' + ('em execução em outro processo' if processados is None else f'{processados} registro(s)'))
+
+@app.cli.command('verificar-indices')
+def comando_verificar_indices():
+    falhas = 0
+    for nome, (ok, plano) in verificar_indices().items():
+        print(f"{'OK   ' if ok else 'FALHA'} {nome}: {' | '.join(plano)}")
+        falhas += not ok
+    if falhas:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    criar_app()
+    preparar_banco()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,152 @@
+import argparse
+import json
+import math
+import statistics
+import sys
+import time
+from datetime import date
+from urllib.parse import quote
+
+from sqlalchemy import event
+
+from app import criar_app, preparar_banco, db, Usuario
+from gerar_dados import SENHA_ADMIN, SENHA_PADRAO, uri_destino
+
+def montar_cenarios(admin_id, morador_id):
+    hoje = date.today().isoformat()
+    return [
+        ('index', 'admin', '/'),
+        ('index_morador', 'morador', '/'),
+        ('listar_visitantes', 'admin', '/visitantes'),
+        ('listar_multas', 'admin', '/multas'),
+        ('listar_multas_morador', 'morador', '/multas'),
+        ('listar_reservas', 'admin', '/reservas'),
+        ('listar_notificacoes_morador', 'morador', '/notificacoes'),
+        ('chat_home', 'admin', '/chat'),
+        ('chat_conversa', 'admin', f'/chat/{morador_id}'),
+        ('chat_conversa_morador', 'morador', f'/chat/{admin_id}'),
+        ('cadastrar_reserva', 'admin', '/cadastrar_reserva'),
+        ('api_visitantes', 'admin', '/api/visitantes'),
+        ('api_multas', 'admin', '/api/multas'),
+        ('api_reservas', 'admin', '/api/reservas'),
+        ('api_notificacoes', 'morador', '/api/notificacoes'),
+        ('api_chat_mensagens', 'admin', f'/api/chat/{morador_id}/mensagens'),
+        ('api_unidades', 'admin', '/api/unidades'),
+        ('api_moradores', 'admin', '/api/moradores'),
+        ('api_disponibilidade', 'morador', f"/api/reservas/disponibilidade?area={quote('Salão de Festas')}&data={hoje}&dias=7"),
+        ('api_busca', 'admin', '/api/busca?q=silva'),
+        ('api_checkin_sugestoes', 'admin', '/api/checkin/sugestoes?q=silv'),
+        ('api_sincronizacao', 'admin', '/api/sincronizacao')
+    ]
+
+def percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(fracao * len(ordenados)) - 1)]
+
+def autenticar(app, username, senha):
+    cliente = app.test_client()
+    resposta = cliente.post('/login', data={'username': username, 'senha': senha})
+    if resposta.status_code != 302:
+        raise SystemExit(f'Falha no login de {username} (status {resposta.status_code})')
+    return cliente
+
+def medir(cliente, url, repeticoes, aquecimento, contador):
+    tempos = []
+    consultas = []
+    for rodada in range(aquecimento + repeticoes):
+        contador[0] = 0
+        inicio = time.perf_counter()
+        resposta = cliente.get(url)
+        resposta.get_data()
+        duracao = time.perf_counter() - inicio
+        if resposta.status_code != 200:
+            raise SystemExit(f'{url} respondeu {resposta.status_code}')
+        if rodada >= aquecimento:
+            tempos.append(duracao * 1000)
+            consultas.append(contador[0])
+    return {
+        'p50_ms': round(percentil(tempos, 0.5), 3),
+        'p95_ms': round(percentil(tempos, 0.95), 3),
+        'max_ms': round(max(tempos), 3),
+        'consultas': int(statistics.median(consultas)),
+        'consultas_max': max(consultas)
+    }
+
+def comparar(resultados, base, tolerancia):
+    regressoes = []
+    for nome, atual in resultados.items():
+        anterior = base.get(nome)
+        if not anterior:
+            continue
+        variacao = (atual['p50_ms'] - anterior['p50_ms']) / anterior['p50_ms'] if anterior['p50_ms'] else 0
+        atual['variacao_p50'] = round(variacao, 3)
+        atual['consultas_base'] = anterior['consultas']
+        if variacao > tolerancia or atual['consultas'] > anterior['consultas']:
+            regressoes.append(nome)
+    return regressoes
+
+def imprimir(resultados):
+    print(f"{'cenário':<30} {'p50 ms':>9} {'p95 ms':>9} {'máx ms':>9} {'SQL':>5} {'Δ p50':>8} {'SQL base':>9}")
+    for nome, r in resultados.items():
+        variacao = f"{r['variacao_p50']:+.0%}" if 'variacao_p50' in r else ''
+        base = str(r['consultas_base']) if 'consultas_base' in r else ''
+        print(f"{nome:<30} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['max_ms']:>9.2f} {r['consultas']:>5} {variacao:>8} {base:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Mede latência e consultas SQL das principais páginas e APIs.')
+    parser.add_argument('--banco', default='benchmark.db', help='arquivo SQLite ou URI gerado por gerar_dados.py')
+    parser.add_argument('--repeticoes', type=int, default=30)
+    parser.add_argument('--aquecimento', type=int, default=3)
+    parser.add_argument('--cenarios', help='lista de cenários separados por vírgula')
+    parser.add_argument('--saida', help='grava os resultados em JSON (linha de base)')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para comparação')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='aumento máximo aceito no p50 (fração)')
+    parser.add_argument('--admin', default='admin')
+    parser.add_argument('--morador', default='morador1')
+    argumentos = parser.parse_args()
+
+    app = criar_app({'SQLALCHEMY_DATABASE_URI': uri_destino(argumentos.banco), 'CONSULTA_LENTA_MS': 0})
+    preparar_banco()
+    with app.app_context():
+        usuarios = dict(db.session.query(Usuario.username, Usuario.id).filter(
+            Usuario.username.in_([argumentos.admin, argumentos.morador])
+        ))
+        db.session.rollback()
+        if len(usuarios) != 2:
+            parser.error('usuários de benchmark não encontrados; gere o banco com gerar_dados.py')
+        contador = [0]
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: contador.__setitem__(0, contador[0] + 1))
+
+    clientes = {
+        'admin': autenticar(app, argumentos.admin, SENHA_ADMIN),
+        'morador': autenticar(app, argumentos.morador, SENHA_PADRAO)
+    }
+    cenarios = montar_cenarios(usuarios[argumentos.admin], usuarios[argumentos.morador])
+    if argumentos.cenarios:
+        escolhidos = set(argumentos.cenarios.split(','))
+        cenarios = [cenario for cenario in cenarios if cenario[0] in escolhidos]
+
+    resultados = {}
+    for nome, perfil, url in cenarios:
+        resultados[nome] = medir(clientes[perfil], url, argumentos.repeticoes, argumentos.aquecimento, contador)
+
+    regressoes = []
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding='utf-8') as arquivo:
+            regressoes = comparar(resultados, json.load(arquivo)['resultados'], argumentos.tolerancia)
+    imprimir(resultados)
+
+    if argumentos.saida:
+        with open(argumentos.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump({
+                'banco': argumentos.banco,
+                'repeticoes': argumentos.repeticoes,
+                'executado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'resultados': resultados
+            }, arquivo, ensure_ascii=False, indent=2)
+    if regressoes:
+        print(f"Regressões: {', '.join(regressoes)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
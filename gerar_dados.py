@@ -0,0 +1,295 @@
+import argparse
+import bisect
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+
+from app import (
+    criar_app, preparar_banco, gerar_hash_senha, db, Unidade, Morador, Usuario, Visitante, Multa, Reserva,
+    Notificacao, ChatMensagem, reconstruir_resumos_conversa, reconstruir_saldos_multas,
+    reconstruir_contagem_visitantes, registrar_estado_inicial_sincronizacao
+)
+
+ESCALAS = {
+    'pequena': {'unidades': 200, 'moradores': 600, 'visitantes': 20000, 'mensagens': 10000,
+                'multas': 1000, 'reservas': 1000, 'notificacoes': 500},
+    'media': {'unidades': 2000, 'moradores': 6000, 'visitantes': 200000, 'mensagens': 100000,
+              'multas': 10000, 'reservas': 10000, 'notificacoes': 2000},
+    'grande': {'unidades': 10000, 'moradores': 30000, 'visitantes': 1000000, 'mensagens': 500000,
+               'multas': 50000, 'reservas': 50000, 'notificacoes': 10000}
+}
+
+NOMES = [
+    'Ana', 'João', 'Maria', 'José', 'Francisco', 'Antônio', 'Conceição', 'Luís', 'Paulo', 'Carlos',
+    'Juliana', 'Márcia', 'Fernanda', 'Patrícia', 'Aline', 'Rafael', 'Lucas', 'Gabriel', 'Letícia',
+    'Bruna', 'Sérgio', 'Cláudia', 'Mônica', 'Fábio', 'Vitória', 'Caio', 'Otávio', 'Raquel', 'Júlia', 'Pedro'
+]
+SOBRENOMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+    'Ribeiro', 'Carvalho', 'Araújo', 'Melo', 'Barbosa', 'Cardoso', 'Rocha', 'Dias', 'Nascimento', 'Conceição',
+    'Magalhães', 'Simões', 'Assunção', 'Brandão', 'Gonçalves', 'Peixoto', 'Teixeira', 'Moraes', 'Galvão', 'Castro'
+]
+AREAS = ['Salão de Festas', 'Churrasqueira', 'Piscina', 'Quadra', 'Academia', 'Espaço Gourmet']
+HORARIOS = [(8, 10), (10, 12), (12, 14), (14, 16), (16, 18), (18, 20), (20, 22)]
+INFRACOES = [
+    'Barulho após as 22h', 'Vaga de garagem ocupada indevidamente', 'Lixo fora do horário',
+    'Uso indevido da área comum', 'Animal solto nas áreas comuns', 'Obra sem autorização'
+]
+AVISOS = [
+    ('Manutenção dos elevadores', 'Os elevadores passarão por manutenção preventiva.'),
+    ('Limpeza da caixa d\'água', 'O abastecimento será interrompido durante a limpeza.'),
+    ('Assembleia geral', 'Convocamos todos os condôminos para a assembleia.'),
+    ('Dedetização', 'As áreas comuns serão dedetizadas nesta semana.'),
+    ('Encomenda na portaria', 'Há uma encomenda aguardando retirada na portaria.')
+]
+FRASES = [
+    'Bom dia, tudo bem?', 'Minha encomenda chegou?', 'Pode liberar a entrada do visitante?',
+    'Obrigado pelo retorno.', 'A manutenção já foi agendada.', 'Qual o horário da piscina?',
+    'O boleto deste mês já está disponível.', 'Vou verificar e retorno em seguida.'
+]
+SENHA_PADRAO = '123456'
+SENHA_ADMIN = 'admin123'
+
+def gerar_cpf(base):
+    digitos = [int(d) for d in f'{base:09d}']
+    for tamanho in (9, 10):
+        soma = sum(d * (tamanho + 1 - i) for i, d in enumerate(digitos))
+        digitos.append(soma * 10 % 11 % 10)
+    texto = ''.join(map(str, digitos))
+    return f'{texto[:3]}.{texto[3:6]}.{texto[6:9]}-{texto[9:]}'
+
+def gerar_telefone(rng):
+    numero = rng.randrange(10 ** 8)
+    return f'(11) 9{numero // 10000:04d}-{numero % 10000:04d}'
+
+def gerar_nome(rng):
+    return f'{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}'
+
+def momentos_ordenados(rng, quantidade, inicio, fim):
+    intervalo = int((fim - inicio).total_seconds())
+    return [inicio + timedelta(seconds=segundos) for segundos in sorted(rng.randrange(intervalo) for _ in range(quantidade))]
+
+def escolhas_concentradas(rng, quantidade, total):
+    acumulados = list(itertools.accumulate(1 / (posicao + 1) for posicao in range(total)))
+    return [bisect.bisect_left(acumulados, rng.random() * acumulados[-1]) for _ in range(quantidade)]
+
+def nome_bloco(posicao):
+    nome = ''
+    posicao += 1
+    while posicao:
+        posicao, resto = divmod(posicao - 1, 26)
+        nome = chr(ord('A') + resto) + nome
+    return nome
+
+def gerar_unidades(rng, quantidade, agora):
+    for posicao in range(quantidade):
+        bloco, apartamento = divmod(posicao, 80)
+        andar, final = divmod(apartamento, 4)
+        yield {
+            'id': posicao + 1,
+            'numero': f'{nome_bloco(bloco)}-{andar + 1}{final + 1:02d}',
+            'bloco': nome_bloco(bloco),
+            'tipo': 'Apartamento',
+            'vagas_garagem': rng.choice((0, 1, 1, 1, 2)),
+            'data_cadastro': agora
+        }
+
+def gerar_moradores(rng, quantidade, unidades, agora):
+    bases = rng.sample(range(1, 10 ** 9), quantidade)
+    for posicao in range(quantidade):
+        yield {
+            'id': posicao + 1,
+            'nome': gerar_nome(rng),
+            'cpf': gerar_cpf(bases[posicao]),
+            'telefone': gerar_telefone(rng),
+            'email': f'morador{posicao + 1}@exemplo.com',
+            'tipo': rng.choice(('Proprietário', 'Proprietário', 'Locatário')),
+            'unidade_id': posicao + 1 if posicao < unidades else rng.randrange(unidades) + 1,
+            'data_cadastro': agora
+        }
+
+def gerar_usuarios(administradores, moradores, agora):
+    hash_admin = gerar_hash_senha(SENHA_ADMIN)
+    hash_morador = gerar_hash_senha(SENHA_PADRAO)
+    for posicao in range(administradores):
+        sufixo = '' if posicao == 0 else str(posicao + 1)
+        yield {
+            'id': posicao + 1, 'username': f'admin{sufixo}', 'email': f'admin{sufixo}@exemplo.com',
+            'senha_hash': hash_admin, 'tipo': 'Admin', 'morador_id': None, 'ativo': True, 'data_cadastro': agora
+        }
+    for posicao in range(moradores):
+        yield {
+            'id': administradores + posicao + 1, 'username': f'morador{posicao + 1}',
+            'email': f'usuario.morador{posicao + 1}@exemplo.com', 'senha_hash': hash_morador,
+            'tipo': 'Morador', 'morador_id': posicao + 1, 'ativo': True, 'data_cadastro': agora
+        }
+
+def gerar_visitantes(rng, quantidade, unidades, agora):
+    frequentes = [(gerar_nome(rng), gerar_cpf(base), gerar_telefone(rng))
+                  for base in rng.sample(range(1, 10 ** 9), max(1, quantidade // 5))]
+    destinos = [rng.randrange(unidades) + 1 for _ in range(len(frequentes))]
+    indices = escolhas_concentradas(rng, quantidade, len(frequentes))
+    for posicao, entrada in enumerate(momentos_ordenados(rng, quantidade, agora - timedelta(days=730), agora)):
+        nome, cpf, telefone = frequentes[indices[posicao]]
+        recente = agora - entrada < timedelta(hours=6)
+        yield {
+            'id': posicao + 1,
+            'nome': nome,
+            'cpf': cpf,
+            'telefone': telefone,
+            'unidade_id': destinos[indices[posicao]],
+            'data_entrada': entrada,
+            'data_saida': None if recente and rng.random() < 0.5 else entrada + timedelta(minutes=rng.randrange(10, 360)),
+            'observacoes': None
+        }
+
+def gerar_multas(rng, quantidade, moradores, hoje, agora):
+    vencimentos = sorted(hoje + timedelta(days=rng.randrange(-365, 60)) for _ in range(quantidade))
+    for posicao, vencimento in enumerate(vencimentos):
+        paga = vencimento < hoje and rng.random() < 0.8
+        yield {
+            'id': posicao + 1,
+            'morador_id': rng.randrange(moradores) + 1,
+            'valor_centavos': rng.choice((5000, 10000, 15050, 20000, 25000, 30000, 50000)),
+            'descricao': rng.choice(INFRACOES),
+            'data_vencimento': vencimento,
+            'data_pagamento': vencimento - timedelta(days=rng.randrange(0, 10)) if paga else None,
+            'status': 'Pago' if paga else 'Vencida' if vencimento < hoje else 'Pendente',
+            'data_cadastro': agora
+        }
+
+def gerar_reservas(rng, quantidade, moradores, hoje, agora):
+    dias = -(-quantidade * 10 // (len(AREAS) * len(HORARIOS) * 7))
+    inicio = hoje - timedelta(days=dias * 3 // 4)
+    vagas = len(AREAS) * len(HORARIOS)
+    ocupadas = sorted(rng.sample(range(dias * vagas), quantidade))
+    for posicao, vaga in enumerate(ocupadas):
+        dia, resto = divmod(vaga, vagas)
+        area, horario = divmod(resto, len(HORARIOS))
+        data_reserva = inicio + timedelta(days=dia)
+        if data_reserva >= hoje:
+            status = rng.choice(('Pendente', 'Aprovada', 'Aprovada'))
+        else:
+            status = rng.choice(('Aprovada', 'Aprovada', 'Aprovada', 'Cancelada', 'Rejeitada'))
+        yield {
+            'id': posicao + 1,
+            'morador_id': rng.randrange(moradores) + 1,
+            'area': AREAS[area],
+            'data': data_reserva,
+            'horario_inicio': dt_time(HORARIOS[horario][0]),
+            'horario_fim': dt_time(HORARIOS[horario][1]),
+            'status': status,
+            'observacoes': None,
+            'criado_em': agora
+        }
+
+def gerar_notificacoes(rng, quantidade, moradores, agora):
+    for posicao, envio in enumerate(momentos_ordenados(rng, quantidade, agora - timedelta(days=365), agora)):
+        titulo, mensagem = rng.choice(AVISOS)
+        yield {
+            'id': posicao + 1,
+            'titulo': titulo,
+            'mensagem': mensagem,
+            'morador_id': None if rng.random() < 0.3 else rng.randrange(moradores) + 1,
+            'autor_id': 1,
+            'data_envio': envio
+        }
+
+def gerar_mensagens(rng, quantidade, administradores, usuarios_moradores, agora):
+    contatos = escolhas_concentradas(rng, quantidade, usuarios_moradores)
+    for posicao, envio in enumerate(momentos_ordenados(rng, quantidade, agora - timedelta(days=365), agora)):
+        morador = administradores + contatos[posicao] + 1
+        admin = contatos[posicao] % administradores + 1
+        remetente, destinatario = (morador, admin) if rng.random() < 0.5 else (admin, morador)
+        yield {
+            'id': posicao + 1,
+            'remetente_id': remetente,
+            'destinatario_id': destinatario,
+            'mensagem': rng.choice(FRASES),
+            'enviada_em': envio,
+            'lida_em': None if agora - envio < timedelta(days=2) else envio + timedelta(minutes=rng.randrange(1, 600))
+        }
+
+def inserir_em_lotes(engine, modelo, linhas, tamanho_lote):
+    inicio = time.perf_counter()
+    total = 0
+    with engine.begin() as conexao:
+        while True:
+            lote = list(itertools.islice(linhas, tamanho_lote))
+            if not lote:
+                break
+            conexao.execute(db.insert(modelo), lote)
+            total += len(lote)
+            print(f'\r{modelo.__tablename__}: {total}', end='', file=sys.stderr, flush=True)
+    print(f'\r{modelo.__tablename__}: {total} em {time.perf_counter() - inicio:.1f}s', file=sys.stderr)
+
+def ajustar_sequencias(conexao, modelos):
+    if conexao.dialect.name != 'postgresql':
+        return
+    for modelo in modelos:
+        tabela = modelo.__tablename__
+        conexao.exec_driver_sql(
+            f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), (SELECT COALESCE(MAX(id), 1) FROM {tabela}))"
+        )
+
+def uri_destino(banco):
+    if '://' in banco:
+        return banco
+    return 'sqlite:///' + os.path.abspath(banco)
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera um condomínio sintético para testes de carga.')
+    parser.add_argument('--banco', default='benchmark.db', help='arquivo SQLite ou URI do banco (deve estar vazio)')
+    parser.add_argument('--escala', choices=ESCALAS, default='pequena')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--referencia', type=date.fromisoformat, default=date.today(), help='data de referência (AAAA-MM-DD)')
+    parser.add_argument('--lote', type=int, default=5000)
+    for nome in ESCALAS['pequena']:
+        parser.add_argument(f'--{nome}', type=int)
+    argumentos = parser.parse_args()
+
+    quantidades = {nome: getattr(argumentos, nome) or padrao for nome, padrao in ESCALAS[argumentos.escala].items()}
+    quantidades['moradores'] = max(quantidades['moradores'], quantidades['unidades'])
+    rng = random.Random(argumentos.semente)
+    hoje = argumentos.referencia
+    agora = datetime.combine(hoje, dt_time(12, 0))
+    administradores = max(1, quantidades['unidades'] // 2000)
+    usuarios_moradores = quantidades['unidades']
+
+    app = criar_app({
+        'SQLALCHEMY_DATABASE_URI': uri_destino(argumentos.banco),
+        'SQLITE_SYNCHRONOUS': 'OFF',
+        'CONSULTA_LENTA_MS': 0
+    })
+    preparar_banco()
+    with app.app_context():
+        if db.session.query(Unidade.id).first() or db.session.query(Usuario.id).first():
+            parser.error(f'o banco {argumentos.banco} já possui dados; informe um banco vazio')
+        db.session.rollback()
+        engine = db.engine
+
+        inserir_em_lotes(engine, Unidade, gerar_unidades(rng, quantidades['unidades'], agora), argumentos.lote)
+        inserir_em_lotes(engine, Morador, gerar_moradores(rng, quantidades['moradores'], quantidades['unidades'], agora), argumentos.lote)
+        inserir_em_lotes(engine, Usuario, gerar_usuarios(administradores, usuarios_moradores, agora), argumentos.lote)
+        inserir_em_lotes(engine, Visitante, gerar_visitantes(rng, quantidades['visitantes'], quantidades['unidades'], agora), argumentos.lote)
+        inserir_em_lotes(engine, Multa, gerar_multas(rng, quantidades['multas'], quantidades['moradores'], hoje, agora), argumentos.lote)
+        inserir_em_lotes(engine, Reserva, gerar_reservas(rng, quantidades['reservas'], quantidades['moradores'], hoje, agora), argumentos.lote)
+        inserir_em_lotes(engine, Notificacao, gerar_notificacoes(rng, quantidades['notificacoes'], quantidades['moradores'], agora), argumentos.lote)
+        inserir_em_lotes(engine, ChatMensagem, gerar_mensagens(rng, quantidades['mensagens'], administradores, usuarios_moradores, agora), argumentos.lote)
+
+        with engine.begin() as conexao:
+            reconstruir_resumos_conversa(conexao)
+            reconstruir_saldos_multas(conexao)
+            reconstruir_contagem_visitantes(conexao)
+            registrar_estado_inicial_sincronizacao(conexao)
+            ajustar_sequencias(conexao, [Unidade, Morador, Usuario, Visitante, Multa, Reserva, Notificacao, ChatMensagem])
+        engine.dispose()
+
+    print(f'Banco gerado: {argumentos.banco}')
+    print(f'Logins: admin / {SENHA_ADMIN} e morador1..morador{usuarios_moradores} / {SENHA_PADRAO}')
+
+if __name__ == '__main__':
+    main()
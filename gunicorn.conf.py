@@ -0,0 +1,26 @@
+import multiprocessing
+import os
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+preload_app = True
+accesslog = '-'
+
+def on_starting(server):
+    from app import app, criar_app, preparar_banco, reconstruir_indice_checkin
+    criar_app(agendador=False)
+    novas = preparar_banco()
+    if novas:
+        server.log.info('Migrações aplicadas: %s', novas)
+    with app.app_context():
+        reconstruir_indice_checkin()
+
+def post_fork(server, worker):
+    from app import app, criar_app, iniciar_agendador
+    criar_app(agendador=False)
+    if app.config['AGENDADOR_EMBUTIDO']:
+        iniciar_agendador()
@@ -0,0 +1,3 @@
+from app import criar_app
+
+app = criar_app(agendador=False)